@@ -0,0 +1,119 @@
+import json
+import logging
+import threading
+import time
+from urllib.request import urlopen
+
+'''
+JSON Web Key Set store
+Keeps the signing keys of a JWKS document in memory, by kid, so verifying a
+token does not fetch the document. This file is a copy of the coffee shop
+backend's src/auth/jwks.py, as the two projects run separately; keep them
+in step.
+'''
+
+logger = logging.getLogger(__name__)
+
+# seconds before the keys are refreshed in the background
+DEFAULT_TTL = 3600
+# an unknown kid refreshes the keys at most this often (seconds), so tokens
+# with made-up kids cannot hammer the JWKS endpoint
+MIN_REFRESH_INTERVAL = 30
+FETCH_TIMEOUT = 5
+
+
+'''
+url_source(url), file_source(path), source_from(location)
+    callables that fetch and parse a JWKS document, from a URL or a local
+    file; source_from picks one by the form of location
+'''
+
+
+def url_source(url, timeout=FETCH_TIMEOUT):
+    def fetch():
+        with urlopen(url, timeout=timeout) as response:
+            return json.loads(response.read())
+    return fetch
+
+
+def file_source(path):
+    def fetch():
+        with open(path) as f:
+            return json.load(f)
+    return fetch
+
+
+def source_from(location):
+    if location.startswith(('https://', 'http://')):
+        return url_source(location)
+    return file_source(location)
+
+
+'''
+JWKSKeyStore
+    keys by kid, fetched through source() on first use and refreshed in the
+    background once they are older than ttl, or straight away when a token
+    names an unknown kid. Concurrent refreshes are collapsed into one fetch.
+    EXAMPLE
+        jwks = JWKSKeyStore(source_from('https://example.auth0.com/.well-known/jwks.json'))
+        key = jwks.get(unverified_header['kid'])
+'''
+
+
+class JWKSKeyStore:
+    def __init__(self, source, ttl=DEFAULT_TTL, min_refresh_interval=MIN_REFRESH_INTERVAL):
+        self.source = source
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.keys = {}
+        self.fetched_at = None
+        self.attempted_at = None
+        self.lock = threading.Lock()
+        # set when the refresh in flight, if any, is done
+        self.refreshing = None
+
+    def get(self, kid):
+        if self.fetched_at is None:
+            self.refresh()
+        elif (time.monotonic() - self.fetched_at > self.ttl
+                and time.monotonic() - self.attempted_at >= self.min_refresh_interval):
+            self.refresh_in_background()
+
+        key = self.keys.get(kid)
+        if key is None and time.monotonic() - self.attempted_at >= self.min_refresh_interval:
+            self.refresh()
+            key = self.keys.get(kid)
+        return key
+
+    def refresh(self):
+        # the first caller fetches; callers arriving meanwhile wait for it
+        with self.lock:
+            done = self.refreshing
+            fetching = done is None
+            if fetching:
+                done = self.refreshing = threading.Event()
+        if not fetching:
+            done.wait()
+            return
+
+        try:
+            document = self.source()
+            # replaced whole, so readers never see a half-built dict
+            self.keys = {key['kid']: key for key in document.get('keys', []) if 'kid' in key}
+            self.fetched_at = time.monotonic()
+        finally:
+            self.attempted_at = time.monotonic()
+            with self.lock:
+                self.refreshing = None
+            done.set()
+
+    def refresh_in_background(self):
+        if self.refreshing is None:
+            threading.Thread(target=self._refresh_quietly, daemon=True).start()
+
+    def _refresh_quietly(self):
+        # a failed background refresh keeps the current keys until the next try
+        try:
+            self.refresh()
+        except Exception:
+            logger.warning('JWKS refresh failed; keeping the current keys', exc_info=True)
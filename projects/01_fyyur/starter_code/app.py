@@ -3,16 +3,26 @@
 #----------------------------------------------------------------------------#
 
 import json
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+import time
+from datetime import datetime, timedelta
+from itertools import groupby
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, jsonify
 from flask_moment import Moment
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
+import click
+from sqlalchemy import event
+from sqlalchemy.orm.attributes import flag_dirty
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
+from search import InvertedIndex
+from pagination import keyset_page, InvalidCursor
+from cache import PageCache, backend_from_config
+from filters import format_datetime
+from importer import read_records, chunked, to_formdata, format_errors
+from bookings import BookingIndex, free_slots, DEFAULT_SHOW_MINUTES, MAX_SHOW_MINUTES, MAX_SHOW_DURATION
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
@@ -22,19 +32,80 @@ moment = Moment(app)
 app.config.from_object('config')
 db = SQLAlchemy(app)
 migrate = Migrate(app, db)
+page_cache = PageCache(backend_from_config(app.config))
 
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
-class Venue(db.Model):
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+
+venue_genres = db.Table('venue_genres',
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+    db.Index('ix_venue_genres_genre_id_venue_id', 'genre_id', 'venue_id'),
+)
+
+artist_genres = db.Table('artist_genres',
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+    db.Index('ix_artist_genres_genre_id_artist_id', 'genre_id', 'artist_id'),
+)
+
+
+class GenresMixin:
+    # genres are read and written as a list of names; names assigned to an
+    # object are resolved to Genre rows in one query when the session flushes
+
+    @property
+    def genres(self):
+        pending = getattr(self, '_pending_genres', None)
+        if pending is not None:
+            return pending
+        return [genre.name for genre in self.genre_list]
+
+    @genres.setter
+    def genres(self, names):
+        self._pending_genres = list(dict.fromkeys(name for name in names or [] if name))
+        flag_dirty(self)
+
+
+def resolve_pending_genres(session, flush_context, instances):
+    owners = [obj for obj in list(session.new) + list(session.dirty)
+              if getattr(obj, '_pending_genres', None) is not None]
+    if not owners:
+        return
+
+    names = {name for owner in owners for name in owner._pending_genres}
+    found = {}
+    if names:
+        with session.no_autoflush:
+            found = {genre.name: genre for genre in session.query(Genre).filter(Genre.name.in_(names))}
+    for name in names - found.keys():
+        found[name] = Genre(name=name)
+        session.add(found[name])
+
+    for owner in owners:
+        owner.genre_list = [found[name] for name in owner._pending_genres]
+        del owner._pending_genres
+
+event.listen(db.session, 'before_flush', resolve_pending_genres)
+
+
+class Venue(GenresMixin, db.Model):
     __tablename__ = 'Venue'
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
-    genres = db.Column(db.String(120))
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
+    # part of the directory's keyset, where a NULL would drop out of the
+    # (state, city, name, id) comparison
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
@@ -43,9 +114,14 @@ class Venue(db.Model):
     seeking_talent = db.Column(db.Boolean, nullable=False, default=False)
     seeking_description = db.Column(db.String(500))
     shows = db.relationship('Show', backref="venue")
+    genre_list = db.relationship('Genre', secondary=venue_genres, order_by='Genre.name')
+
+    __table_args__ = (
+        db.Index('ix_Venue_state_city_name', 'state', 'city', 'name', 'id'),
+    )
 
 
-class Artist(db.Model):
+class Artist(GenresMixin, db.Model):
     __tablename__ = 'Artist'
 
     id = db.Column(db.Integer, primary_key=True)
@@ -53,13 +129,17 @@ class Artist(db.Model):
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website = db.Column(db.String(500))
     seeking_venue = db.Column(db.Boolean, nullable=True, default=False)
     seeking_description = db.Column(db.String(500))
     shows = db.relationship('Show', backref="artist")
+    genre_list = db.relationship('Genre', secondary=artist_genres, order_by='Genre.name')
+
+    __table_args__ = (
+        db.Index('ix_Artist_name', 'name', 'id'),
+    )
 
 
 class Show(db.Model):
@@ -71,19 +151,248 @@ class Show(db.Model):
         'Venue.id'), nullable=False)
     artist_id = db.Column(db.Integer, db.ForeignKey(
                 'Artist.id'), nullable=False)
+    duration_minutes = db.Column(db.Integer, nullable=False,
+        default=DEFAULT_SHOW_MINUTES, server_default=str(DEFAULT_SHOW_MINUTES))
+
+    # on PostgreSQL, exclusion constraints added in migration f3e8a1b6c902
+    # reject overlapping shows at the same venue or by the same artist; the
+    # check caps durations at the MAX_SHOW_MINUTES the overlap lookups assume
+    __table_args__ = (
+        db.CheckConstraint('duration_minutes BETWEEN 1 AND {}'.format(MAX_SHOW_MINUTES),
+            name='Show_duration_minutes_range'),
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_Show_start_time', 'start_time', 'id'),
+    )
+
+    @property
+    def end_time(self):
+        return self.start_time + timedelta(minutes=self.duration_minutes)
 
 
 #----------------------------------------------------------------------------#
-# Filters.
+# Queries.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
+GENRE_LINKS = {
+  Venue: (venue_genres, venue_genres.c.venue_id),
+  Artist: (artist_genres, artist_genres.c.artist_id),
+}
+
+def with_genre(query, model, genre):
+  # resolved through the unique genre name and the (genre_id, owner) link index
+  links, owner_id = GENRE_LINKS[model]
+  return query.join(links, owner_id == model.id) \
+    .join(Genre, Genre.id == links.c.genre_id) \
+    .filter(Genre.name == genre)
+
+VENUE_DIRECTORY_KEYS = [Venue.state, Venue.city, Venue.name, Venue.id]
+
+def venue_directory_query(now, genre=None):
+  upcoming = db.func.count(Show.id).filter(Show.start_time > now)
+  # grouped by the sort keys (unique through Venue.id) rather than by id
+  # alone, so the planner can walk ix_Venue_state_city_name from the cursor
+  # and stop at the page size instead of aggregating and sorting every venue
+  query = db.session.query(
+      Venue.id,
+      Venue.name,
+      Venue.city,
+      Venue.state,
+      upcoming.label('num_upcoming_shows')
+    ).outerjoin(Show, Show.venue_id == Venue.id) \
+    .group_by(*VENUE_DIRECTORY_KEYS)
+  if genre:
+    query = with_genre(query, Venue, genre)
+  return query
+
+def artist_listing_query(genre=None):
+  query = db.session.query(Artist.id, Artist.name)
+  if genre:
+    query = with_genre(query, Artist, genre)
+  return query
+
+ARTIST_LISTING_KEYS = [Artist.name, Artist.id]
+
+def upcoming_shows_query(now):
+  return db.session.query(
+      Show.id,
+      Show.start_time,
+      Venue.id.label('venue_id'),
+      Venue.name.label('venue_name'),
+      Artist.id.label('artist_id'),
+      Artist.name.label('artist_name'),
+      Artist.image_link.label('artist_image_link')
+    ).join(Venue, Show.venue_id == Venue.id) \
+    .join(Artist, Show.artist_id == Artist.id) \
+    .filter(Show.start_time >= now)
+
+UPCOMING_SHOWS_KEYS = [Show.start_time, Show.id]
+
+def venue_detail_query(venue_id):
+  # the venue, its genres, its shows and each show's artist in a single round
+  # trip; the genres multiply the show rows, but a venue only has a few
+  return Venue.query.options(
+      db.joinedload(Venue.shows).joinedload(Show.artist),
+      db.joinedload(Venue.genre_list)
+    ).filter(Venue.id == venue_id)
+
+def artist_detail_query(artist_id):
+  return Artist.query.options(
+      db.joinedload(Artist.shows).joinedload(Show.venue),
+      db.joinedload(Artist.genre_list)
+    ).filter(Artist.id == artist_id)
+
+def partition_shows(shows, now):
+  past_shows = []
+  upcoming_shows = []
+  for show in sorted(shows, key=lambda show: show.start_time):
+    if show.start_time >= now:
+      upcoming_shows.append(show)
+    else:
+      past_shows.append(show)
+  return past_shows, upcoming_shows
+
+ITEMS_PER_PAGE = 20
+
+
+def listing_page(query, keys):
+  try:
+    return keyset_page(query, keys, request.args.get('cursor'), ITEMS_PER_PAGE)
+  except InvalidCursor:
+    abort(400)
+
+
+# cached pages that show a venue or an artist; used to invalidate them on writes
+
+def venue_pages(venue_id):
+  artist_ids = db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()
+  return ['/venues', '/shows', f'/venues/{venue_id}'] + \
+    [f'/artists/{artist_id}' for (artist_id,) in artist_ids]
+
+def artist_pages(artist_id):
+  venue_ids = db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()
+  return ['/artists', '/shows', f'/artists/{artist_id}'] + \
+    [f'/venues/{venue_id}' for (venue_id,) in venue_ids]
+
+
+#----------------------------------------------------------------------------#
+# Bookings.
+#----------------------------------------------------------------------------#
+
+def load_bookings(key):
+  # every show of one venue or artist, read through its (id, start_time) index
+  kind, owner_id = key
+  owner_column = Show.venue_id if kind == 'venue' else Show.artist_id
+  rows = db.session.query(Show.start_time, Show.duration_minutes).filter(owner_column == owner_id)
+  return [(start, start + timedelta(minutes=minutes)) for start, minutes in rows]
+
+# in-process calendars; on PostgreSQL the exclusion constraints have the last word
+booking_index = BookingIndex(load_bookings)
+
+def booking_keys(venue_id, artist_id):
+  return [('venue', int(venue_id)), ('artist', int(artist_id))]
+
+# exclusion constraints from migration f3e8a1b6c902
+BOOKING_CONSTRAINTS = {
+  'Show_venue_no_overlap': 'venue',
+  'Show_artist_no_overlap': 'artist',
+}
+
+def constraint_conflicts(error, keys):
+  # the booking keys whose exclusion constraint a failed INSERT violated
+  constraint = getattr(getattr(getattr(error, 'orig', None), 'diag', None), 'constraint_name', None)
+  kind = BOOKING_CONSTRAINTS.get(constraint)
+  return [key for key in keys if key[0] == kind]
+
+def booking_conflict_message(conflicts):
+  return ' and '.join(
+    '{} {} is already booked at that time'.format(kind, owner_id) for kind, owner_id in conflicts
+  ).capitalize()
+
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+SEARCH_RESULTS_PER_PAGE = 10
+
+# fallback indexes for databases without pg_trgm, rebuilt after any write
+search_indexes = {
+  Venue: InvertedIndex(),
+  Artist: InvertedIndex(),
+}
+
+def invalidate_search_index(mapper, connection, target):
+  search_indexes[type(target)].invalidate()
+
+for model in search_indexes:
+  for event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(model, event_name, invalidate_search_index)
+
+def search_document(model):
+  # must match the expression of the trigram index created in migration c7a4e9d15b20
+  return db.func.coalesce(model.name, '') + ' ' + \
+    db.func.coalesce(model.city, '') + ' ' + \
+    db.func.coalesce(model.state, '')
+
+def search_query(model, search_term):
+  # ranked PostgreSQL search, answered from the trigram and genre link indexes
+  document = search_document(model)
+  pattern = f'%{search_term}%'
+  links, owner_id = GENRE_LINKS[model]
+  # two index lookups instead of an OR that would make the planner scan every row
+  matching = db.session.query(model.id).filter(document.ilike(pattern)).union(
+    db.session.query(owner_id).join(Genre, Genre.id == links.c.genre_id)
+      .filter(Genre.name.ilike(pattern)))
+  return model.query.filter(model.id.in_(matching)).order_by(
+    db.func.word_similarity(search_term, document).desc(), model.name, model.id)
+
+def search_entities(model, search_term, page):
+  # returns the total number of matches and the requested page of them
+  start = (page - 1) * SEARCH_RESULTS_PER_PAGE
+
+  if not search_term.strip():
+    query = model.query.order_by(model.name, model.id)
+    return query.count(), query.offset(start).limit(SEARCH_RESULTS_PER_PAGE).all()
+
+  if db.engine.dialect.name == 'postgresql':
+    query = search_query(model, search_term)
+    return query.order_by(None).count(), query.offset(start).limit(SEARCH_RESULTS_PER_PAGE).all()
+
+  index = search_indexes[model]
+  if index.stale:
+    links, owner_id = GENRE_LINKS[model]
+    genre_names = {}
+    for owner, name in db.session.query(owner_id, Genre.name).join(Genre, Genre.id == links.c.genre_id):
+      genre_names.setdefault(owner, []).append(name)
+    rows = db.session.query(model.id, model.name, model.city, model.state)
+    index.build((row.id, ' '.join(filter(None, row[1:] + tuple(genre_names.get(row.id, ())))))
+                for row in rows)
+
+  matches = index.search(search_term)
+  page_ids = matches[start:start + SEARCH_RESULTS_PER_PAGE]
+  if not page_ids:
+    return len(matches), []
+  found = {find.id: find for find in model.query.filter(model.id.in_(page_ids))}
+  return len(matches), [found[find_id] for find_id in page_ids if find_id in found]
+
+def search_response(model, search_term, page):
+  count, search_found = search_entities(model, search_term, page)
+  return {
+    "count": count,
+    "data": [{
+      "id": find.id,
+      "name": find.name
+    } for find in search_found],
+    "page": page,
+    "has_prev": page > 1,
+    "has_next": page * SEARCH_RESULTS_PER_PAGE < count
+  }
+
+
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
 
 app.jinja_env.filters['datetime'] = format_datetime
 
@@ -100,104 +409,85 @@ def index():
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@page_cache.cached
 def venues():
 
-  all_cities = Venue.query.distinct(Venue.city, Venue.state).all()
+  genre = request.args.get('genre')
+  page = listing_page(venue_directory_query(datetime.now(), genre), VENUE_DIRECTORY_KEYS)
   data = []
 
-  for area in all_cities:
-    area_venues = Venue.query.filter_by(state=area.state).filter_by(city=area.city).all()
-    venue_data = []
-    for venue in area_venues:
-      venue_data.append({
-        "id": venue.id,
-        "name": venue.name,
-        "num_upcoming_shows": len(db.session.query(Show).filter(Show.venue_id==1).filter(Show.start_time>datetime.now()).all())
-      })
+  # one grouped query for a page of venues and their upcoming show counts,
+  # ordered so that venues of the same area arrive next to each other
+  for (city, state), area_venues in groupby(page.items, key=lambda row: (row.city, row.state)):
     data.append({
-      "city": area.city,
-      "state": area.state,
-      "venues": venue_data
+      "city": city,
+      "state": state,
+      "venues": [{
+        "id": row.id,
+        "name": row.name,
+        "num_upcoming_shows": row.num_upcoming_shows
+      } for row in area_venues]
     })
 
-  return render_template('pages/venues.html', areas=data);
+  return render_template('pages/venues.html', areas=data, genre=genre,
+    next_cursor=page.next_cursor, prev_cursor=page.prev_cursor)
 
 #  Search Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues/search', methods=['POST'])
+@app.route('/venues/search', methods=['GET', 'POST'])
 def search_venues():
 
-  search_term=request.form.get('search_term', '')
-  search_found = Venue.query.filter(Venue.name.ilike(f'%{search_term}%')).all()
-  data=[]
-
-  for find in search_found:
-    data.append({
-      "id": find.id,
-      "name": find.name
-    })
+  search_term = request.values.get('search_term', '')
+  page = max(request.values.get('page', 1, type=int), 1)
+  response = search_response(Venue, search_term, page)
 
-    response = {
-      "count": len(search_found),
-      "data": data
-      }
-
-  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+  return render_template('pages/search_venues.html', results=response, search_term=search_term)
 
 #  Display individual Venue
 #  ----------------------------------------------------------------
 
 @app.route('/venues/<int:venue_id>')
+@page_cache.cached
 def show_venue(venue_id):
 
- venue = Venue.query.filter_by(id=venue_id).first()
-
- upcoming_show_list = db.session.query(Show).join(Artist).filter(Show.venue_id==venue_id,Show.start_time >= datetime.now()).all()
- past_show_list = db.session.query(Show).join(Artist).filter(Show.venue_id==venue_id,Show.start_time < datetime.now()).all()
+  venue = venue_detail_query(venue_id).one_or_none()
+  if venue is None:
+    abort(404)
 
- upcoming_shows = []
+  past_show_list, upcoming_show_list = partition_shows(venue.shows, datetime.now())
 
- for show in upcoming_show_list:
-    upcoming_shows.append({
-        'artist_id': show.artist.id,
-        'artist_name': show.artist.name,
-        'artist_image_link': show.artist.image_link,
-        'start_time': show.start_time.strftime('%Y-%m-%d %H:%M:%S'),
-      })
+  def show_data(show):
+    return {
+      'artist_id': show.artist.id,
+      'artist_name': show.artist.name,
+      'artist_image_link': show.artist.image_link,
+      'start_time': show.start_time,
+    }
 
- past_shows = []
+  past_shows = [show_data(show) for show in past_show_list]
+  upcoming_shows = [show_data(show) for show in upcoming_show_list]
 
- for show in past_show_list:
-    past_shows.append({
-        'artist_id': show.artist.id,
-        'artist_name': show.artist.name,
-        'artist_image_link': show.artist.image_link,
-        'start_time': show.start_time.strftime('%Y-%m-%d %H:%M:%S'),
-      })
+  data = {
+    "id": venue.id,
+    "name": venue.name,
+    "genres": venue.genres,
+    "address": venue.address,
+    "city": venue.city,
+    "state": venue.state,
+    "phone": venue.phone,
+    "website": venue.website,
+    "facebook_link": venue.facebook_link,
+    "seeking_talent": venue.seeking_talent,
+    "seeking_description": venue.seeking_description,
+    "image_link": venue.image_link,
+    "past_shows": past_shows,
+    "upcoming_shows": upcoming_shows,
+    "past_shows_count": len(past_shows),
+    "upcoming_shows_count": len(upcoming_shows),
+  }
 
- data = {
-   "id": venue.id,
-   "name": venue.name,
-   "genres": [{
-     "genre" : venue.genres
-   }],
-   "address": venue.address,
-   "city": venue.city,
-   "state": venue.state,
-   "phone": venue.phone,
-   "website": venue.website,
-   "facebook_link": venue.facebook_link,
-   "seeking_talent": venue.seeking_talent,
-   "seeking_description": venue.seeking_description,
-   "image_link": venue.image_link,
-   "past_shows": past_shows,
-   "upcoming_shows": upcoming_shows,
-   "past_shows_count": len(past_shows),
-   "upcoming_shows_count": len(upcoming_shows),
- }
-
- return render_template('pages/show_venue.html', venue=data)
+  return render_template('pages/show_venue.html', venue=data)
 
 #  Update Venue
 #  ----------------------------------------------------------------
@@ -220,6 +510,7 @@ def edit_venue_submission(venue_id):
     venue = Venue.query.get(venue_id)
     form.populate_obj(venue)
     db.session.commit()
+    page_cache.invalidate(*venue_pages(venue_id))
   except Exception as e:
     error = True
     db.session.rollback()
@@ -259,6 +550,7 @@ def create_venue_submission():
     )
     db.session.add(venue)
     db.session.commit()
+    page_cache.invalidate('/venues')
   except Exception as e:
     error = True
     db.session.rollback()
@@ -283,8 +575,12 @@ def delete_venue(venue_id):
 
   error = False
   try:
+    stale_pages = venue_pages(venue_id)
     db.session.delete(venue)
     db.session.commit()
+    page_cache.invalidate(*stale_pages)
+    # the venue's artists' calendars held its shows too
+    booking_index.clear()
   except Exception as e:
     error = True
     db.session.rollback()
@@ -304,79 +600,62 @@ def delete_venue(venue_id):
 #  ----------------------------------------------------------------
 
 @app.route('/artists')
+@page_cache.cached
 def artists():
 
-  all_artists = Artist.query.all()
+  genre = request.args.get('genre')
+  page = listing_page(artist_listing_query(genre), ARTIST_LISTING_KEYS)
   data = []
 
-  for artist in all_artists:
+  for artist in page.items:
     data.append({
       "id": artist.id,
       "name": artist.name
     })
 
-  return render_template('pages/artists.html', artists=data)
+  return render_template('pages/artists.html', artists=data, genre=genre,
+    next_cursor=page.next_cursor, prev_cursor=page.prev_cursor)
 
 #  Search Artists
 #  ----------------------------------------------------------------
 
-@app.route('/artists/search', methods=['POST'])
+@app.route('/artists/search', methods=['GET', 'POST'])
 def search_artists():
 
-  search_term=request.form.get('search_term', '')
-  search_found = Artist.query.filter(Artist.name.ilike(f'%{search_term}%')).all()
-  data=[]
-
-  for find in search_found:
-    data.append({
-      "id": find.id,
-      "name": find.name
-    })
-
-    response = {
-      "count": len(search_found),
-      "data": data
-      }
+  search_term = request.values.get('search_term', '')
+  page = max(request.values.get('page', 1, type=int), 1)
+  response = search_response(Artist, search_term, page)
 
-  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+  return render_template('pages/search_artists.html', results=response, search_term=search_term)
 
 #  Display individual Artist
 #  ----------------------------------------------------------------
 
 @app.route('/artists/<int:artist_id>')
+@page_cache.cached
 def show_artist(artist_id):
 
-  artist = Artist.query.filter_by(id=artist_id).first()
+  artist = artist_detail_query(artist_id).one_or_none()
+  if artist is None:
+    abort(404)
 
-  upcoming_show_list = db.session.query(Show).join(Artist).filter(Show.artist_id==artist_id,Show.start_time >= datetime.now()).all()
-  past_show_list = db.session.query(Show).join(Artist).filter(Show.artist_id==artist_id,Show.start_time < datetime.now()).all()
+  past_show_list, upcoming_show_list = partition_shows(artist.shows, datetime.now())
 
-  upcoming_shows = []
-
-  for show in upcoming_show_list:
-     upcoming_shows.append({
-        'venue_id': show.venue.id,
-        'venue_name': show.venue.name,
-        'venue_image_link': show.venue.image_link,
-        'start_time': show.start_time.strftime('%Y-%m-%d %H:%M:%S'),
-      })
+  def show_data(show):
+    return {
+      'venue_id': show.venue.id,
+      'venue_name': show.venue.name,
+      'venue_image_link': show.venue.image_link,
+      'start_time': show.start_time,
+    }
 
-  past_shows = []
-
-  for show in past_show_list:
-     past_shows.append({
-        'venue_id': show.venue.id,
-        'venue_name': show.venue.name,
-        'venue_image_link': show.venue.image_link,
-        'start_time': show.start_time.strftime('%Y-%m-%d %H:%M:%S'),
-      })
+  past_shows = [show_data(show) for show in past_show_list]
+  upcoming_shows = [show_data(show) for show in upcoming_show_list]
 
   data = {
     "id": artist.id,
     "name": artist.name,
-    "genres": [{
-      "genre" : artist.genres
-    }],
+    "genres": artist.genres,
     "city": artist.city,
     "state": artist.state,
     "phone": artist.phone,
@@ -414,6 +693,7 @@ def edit_artist_submission(artist_id):
     artist = Artist.query.get(artist_id)
     form.populate_obj(artist)
     db.session.commit()
+    page_cache.invalidate(*artist_pages(artist_id))
   except Exception as e:
     error = True
     db.session.rollback()
@@ -451,6 +731,7 @@ def create_artist_submission():
     )
     db.session.add(artist)
     db.session.commit()
+    page_cache.invalidate('/artists')
   except Exception as e:
     error = True
     db.session.rollback()
@@ -470,23 +751,24 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@page_cache.cached
 def shows():
 
-  allShows = db.session.query(Show).join(Artist).join(Venue).filter(Show.start_time >= datetime.now()).all()
-
+  page = listing_page(upcoming_shows_query(datetime.now()), UPCOMING_SHOWS_KEYS)
   data = []
 
-  for show in allShows:
+  for show in page.items:
      data.append({
-        'venue_id': show.venue.id,
-        'venue_name': show.venue.name,
-        'artist_id': show.artist.id,
-        'artist_name': show.artist.name,
-        'artist_image_link': show.artist.image_link,
-        'start_time': show.start_time.strftime('%Y-%m-%d %H:%M:%S'),
+        'venue_id': show.venue_id,
+        'venue_name': show.venue_name,
+        'artist_id': show.artist_id,
+        'artist_name': show.artist_name,
+        'artist_image_link': show.artist_image_link,
+        'start_time': show.start_time,
       })
 
-  return render_template('pages/shows.html', shows=data)
+  return render_template('pages/shows.html', shows=data,
+    next_cursor=page.next_cursor, prev_cursor=page.prev_cursor)
 
 #  Create show
 #  ----------------------------------------------------------------
@@ -500,28 +782,94 @@ def create_shows():
 @app.route('/shows/create', methods=['POST'])
 def create_show_submission():
 
+  # the form template has no CSRF token field
+  form = ShowForm(request.form, meta={'csrf': False})
+  # the booking checks rely on no show being longer than MAX_SHOW_MINUTES
+  if not form.validate():
+    flash('Show could not be listed. ' + format_errors(form.errors))
+    return render_template('forms/new_show.html', form=form)
+
   error = False
+  keys = []
+  conflicts = []
   try:
     show = Show(
     artist_id = request.form['artist_id'],
     venue_id = request.form['venue_id'],
-    start_time = request.form['start_time'],
+    start_time = form.start_time.data,
+    duration_minutes = form.duration_minutes.data or DEFAULT_SHOW_MINUTES,
     )
-    db.session.add(show)
-    db.session.commit()
+    keys = booking_keys(show.venue_id, show.artist_id)
+    if db.engine.dialect.name != 'postgresql':
+      conflicts = booking_index.conflicts(keys, show.start_time, show.end_time)
+    if conflicts:
+      error = True
+    else:
+      db.session.add(show)
+      db.session.commit()
+      booking_index.add(keys, show.start_time, show.end_time)
+      page_cache.invalidate('/shows', '/venues',
+        f'/venues/{show.venue_id}', f'/artists/{show.artist_id}')
   except Exception as e:
     error = True
     db.session.rollback()
+    conflicts = constraint_conflicts(e, keys)
   finally:
     db.session.close()
-  if error:
+  if conflicts:
+       # double booking
+    flash(booking_conflict_message(conflicts) + '. Show starting ' + request.form['start_time'] + ' could not be listed.')
+  elif error:
        # unsuccesful
-    flash('An error occurred. Show starting ' + data.start_time + ' could not be listed.')
+    flash('An error occurred. Show starting ' + request.form['start_time'] + ' could not be listed.')
   else:
        # successful
     flash('Show starting ' + request.form['start_time'] + ' was successfully listed!')
 
-    return render_template('pages/home.html')
+  return render_template('pages/home.html')
+
+#  Venue availability
+#  ----------------------------------------------------------------
+
+MAX_AVAILABILITY_RANGE = timedelta(days=92)
+
+@app.route('/venues/<int:venue_id>/availability')
+def venue_availability(venue_id):
+
+  try:
+    range_start = datetime.fromisoformat(request.args['start']) if 'start' in request.args else datetime.now()
+    range_end = datetime.fromisoformat(request.args['end']) if 'end' in request.args else range_start + timedelta(days=7)
+  except ValueError:
+    abort(400)
+  # show times are stored without a time zone, so a range with an offset
+  # cannot be compared with them
+  if range_start.tzinfo is not None or range_end.tzinfo is not None:
+    abort(400)
+  if not range_start < range_end <= range_start + MAX_AVAILABILITY_RANGE:
+    abort(400)
+  min_minutes = request.args.get('min_minutes', DEFAULT_SHOW_MINUTES, type=int)
+
+  if db.session.query(Venue.id).filter(Venue.id == venue_id).scalar() is None:
+    abort(404)
+
+  # only the shows that can overlap the range, through the (venue_id, start_time) index
+  rows = db.session.query(Show.start_time, Show.duration_minutes).filter(
+      Show.venue_id == venue_id,
+      Show.start_time >= range_start - MAX_SHOW_DURATION,
+      Show.start_time < range_end
+    ).order_by(Show.start_time)
+  bookings = [(start, start + timedelta(minutes=minutes)) for start, minutes in rows]
+  slots = free_slots(bookings, range_start, range_end, timedelta(minutes=min_minutes))
+
+  return jsonify({
+    'venue_id': venue_id,
+    'start': range_start.isoformat(),
+    'end': range_end.isoformat(),
+    'free_slots': [{
+      'start': start.isoformat(),
+      'end': end.isoformat()
+    } for start, end in slots]
+  })
 
 @app.errorhandler(404)
 def not_found_error(error):
@@ -542,6 +890,152 @@ if not app.debug:
     app.logger.addHandler(file_handler)
     app.logger.info('errors')
 
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+IMPORT_CHUNK_SIZE = 1000
+
+def allocate_ids(model, count):
+  # reserves primary keys up front so a chunk and its genre links can be
+  # inserted with executemany instead of one INSERT ... RETURNING per row
+  if db.engine.dialect.name == 'postgresql':
+    sequence = db.session.execute(
+      db.text("SELECT pg_get_serial_sequence(:table, 'id')"),
+      {'table': '"{}"'.format(model.__tablename__)}).scalar()
+    rows = db.session.execute(
+      db.text('SELECT nextval(:sequence) FROM generate_series(1, :count)'),
+      {'sequence': sequence, 'count': count})
+    return [row[0] for row in rows]
+  start = (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+  return list(range(start, start + count))
+
+def genre_ids(names):
+  found = dict(db.session.query(Genre.name, Genre.id).filter(Genre.name.in_(names)))
+  missing = set(names) - found.keys()
+  if missing:
+    db.session.execute(Genre.__table__.insert(), [{'name': name} for name in missing])
+    found.update(db.session.query(Genre.name, Genre.id).filter(Genre.name.in_(missing)))
+  return found
+
+def insert_with_genres(model, rows):
+  # rows are form data dicts; their genres go to the link table
+  ids = allocate_ids(model, len(rows))
+  links, owner_id = GENRE_LINKS[model]
+  names = genre_ids({name for row in rows for name in row['genres']})
+  link_rows = []
+  for row, row_id in zip(rows, ids):
+    row['id'] = row_id
+    link_rows.extend({owner_id.key: row_id, 'genre_id': names[name]} for name in set(row.pop('genres')))
+  db.session.execute(model.__table__.insert(), rows)
+  if link_rows:
+    db.session.execute(links.insert(), link_rows)
+
+@app.cli.command('import-data')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'ndjson']),
+  help='Input format, guessed from the file extension by default.')
+@click.option('--chunk-size', default=IMPORT_CHUNK_SIZE, show_default=True,
+  help='Rows validated and inserted per transaction.')
+def import_data(kind, path, file_format, chunk_size):
+  """Bulk import venues, artists or shows from a CSV or NDJSON file.
+
+  Rows are checked with the same rules as the web forms. Shows may name
+  their artist and venue (artist, venue columns) instead of giving ids.
+  """
+  model, form_class = {
+    'venues': (Venue, VenueForm),
+    'artists': (Artist, ArtistForm),
+    'shows': (Show, ShowForm),
+  }[kind]
+  columns = set(model.__table__.columns.keys()) | {'genres'}
+
+  if model is Show:
+    # foreign keys are resolved from memory, not with a query per row
+    artist_ids = {name: artist_id for artist_id, name in db.session.query(Artist.id, Artist.name)}
+    venue_ids = {name: venue_id for venue_id, name in db.session.query(Venue.id, Venue.name)}
+    known_artists, known_venues = set(artist_ids.values()), set(venue_ids.values())
+    touched_pages = set()
+
+  imported = rejected = 0
+  started = time.perf_counter()
+
+  for chunk in chunked(read_records(path, file_format), chunk_size):
+    rows = []
+    for line_no, record, error in chunk:
+      if record is not None:
+        if model is Show:
+          if 'artist_id' not in record and 'artist' in record:
+            record['artist_id'] = artist_ids.get(record['artist'], '')
+          if 'venue_id' not in record and 'venue' in record:
+            record['venue_id'] = venue_ids.get(record['venue'], '')
+
+        form = form_class(formdata=to_formdata(record, list_fields=('genres',)), meta={'csrf': False})
+        if not form.validate():
+          error = format_errors(form.errors)
+        elif model is Show and not record.get('start_time'):
+          # the form would fall back to its default of the current time
+          error = 'start_time: This field is required.'
+        elif model is Show and not valid_id(form.artist_id.data, known_artists):
+          error = 'artist_id: unknown artist'
+        elif model is Show and not valid_id(form.venue_id.data, known_venues):
+          error = 'venue_id: unknown venue'
+        elif model is Show:
+          keys = booking_keys(form.venue_id.data, form.artist_id.data)
+          start_time = form.start_time.data
+          end_time = start_time + timedelta(minutes=form.duration_minutes.data or DEFAULT_SHOW_MINUTES)
+          conflicts = booking_index.conflicts(keys, start_time, end_time)
+          if conflicts:
+            error = booking_conflict_message(conflicts)
+          else:
+            booking_index.add(keys, start_time, end_time)
+
+      if error:
+        rejected += 1
+        click.echo('{}:{}: {}'.format(path, line_no, error), err=True)
+        continue
+      row = {key: value for key, value in form.data.items() if key in columns}
+      if model is Show:
+        row['artist_id'], row['venue_id'] = int(row['artist_id']), int(row['venue_id'])
+        row['duration_minutes'] = row['duration_minutes'] or DEFAULT_SHOW_MINUTES
+      rows.append(row)
+
+    if not rows:
+      continue
+    try:
+      if model is Show:
+        db.session.execute(Show.__table__.insert(), rows)
+        touched_pages.update('/artists/{}'.format(row['artist_id']) for row in rows)
+        touched_pages.update('/venues/{}'.format(row['venue_id']) for row in rows)
+      else:
+        insert_with_genres(model, rows)
+      db.session.commit()
+    except Exception as e:
+      db.session.rollback()
+      booking_index.clear()
+      raise click.ClickException('chunk ending at line {} failed after {} rows were imported: {}'.format(
+        chunk[-1][0], imported, e))
+
+    imported += len(rows)
+    click.echo('{}: {} imported, {} rejected ({:.0f} rows/s)'.format(
+      kind, imported, rejected, imported / (time.perf_counter() - started)))
+
+  # Core inserts bypass the ORM events that keep these up to date
+  if model is Show:
+    page_cache.invalidate('/shows', '/venues', *touched_pages)
+  else:
+    search_indexes[model].invalidate()
+    page_cache.invalidate('/' + kind)
+
+  elapsed = time.perf_counter() - started
+  click.echo('{}: done, {} imported, {} rejected in {:.1f}s ({:.0f} rows/s)'.format(
+    kind, imported, rejected, elapsed, imported / elapsed if elapsed else 0))
+
+def valid_id(value, known_ids):
+  return value.isdigit() and int(value) in known_ids
+
+
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
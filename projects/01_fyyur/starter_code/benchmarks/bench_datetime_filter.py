@@ -0,0 +1,54 @@
+'''
+Per-call cost of the templates' datetime filter on a page of 10k shows.
+
+    python benchmarks/bench_datetime_filter.py [--rows N] [--repeat N]
+
+"before" is the filter as it used to be: views stringified start_time and
+the filter parsed it back and rebuilt the babel pattern on every call.
+'''
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from filters import format_datetime
+
+
+def format_datetime_before(value, format='medium'):
+  date = dateutil.parser.parse(value)
+  if format == 'full':
+      format="EEEE MMMM, d, y 'at' h:mma"
+  elif format == 'medium':
+      format="EE MM, dd, y h:mma"
+  return babel.dates.format_datetime(date, format)
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--rows', type=int, default=10000)
+  parser.add_argument('--repeat', type=int, default=3)
+  args = parser.parse_args()
+
+  start = datetime(2021, 3, 1, 19, 30)
+  start_times = [start + timedelta(hours=i) for i in range(args.rows)]
+  start_strings = [value.strftime('%Y-%m-%d %H:%M:%S') for value in start_times]
+
+  cases = [
+    ('before (str, reparsed)', lambda: [format_datetime_before(value, 'full') for value in start_strings]),
+    ('after (str, reparsed)', lambda: [format_datetime(value, 'full') for value in start_strings]),
+    ('after (native datetime)', lambda: [format_datetime(value, 'full') for value in start_times]),
+  ]
+
+  print('%d rows, best of %d' % (args.rows, args.repeat))
+  for name, render in cases:
+    best = min(timeit.repeat(render, number=1, repeat=args.repeat))
+    print('%-26s %8.1f ms/page %8.2f us/call' % (name, best * 1000, best * 1e6 / args.rows))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,88 @@
+import threading
+from bisect import bisect_left, insort
+from datetime import timedelta
+
+#----------------------------------------------------------------------------#
+# Booking calendars.
+#
+# A calendar holds the bookings of one venue or one artist sorted by start
+# time. Since no booking is longer than MAX_SHOW_DURATION, the only bookings
+# that can overlap [start, end) start in [start - MAX_SHOW_DURATION, end),
+# which a binary search finds in O(log n).
+#----------------------------------------------------------------------------#
+
+DEFAULT_SHOW_MINUTES = 120
+MAX_SHOW_MINUTES = 24 * 60
+MAX_SHOW_DURATION = timedelta(minutes=MAX_SHOW_MINUTES)
+
+
+class Calendar:
+
+  def __init__(self, bookings=()):
+    # (start, end) pairs, kept sorted
+    self.bookings = sorted(bookings)
+
+  def overlapping(self, start, end):
+    first = bisect_left(self.bookings, (start - MAX_SHOW_DURATION,))
+    last = bisect_left(self.bookings, (end,))
+    return [booking for booking in self.bookings[first:last] if booking[1] > start]
+
+  def conflicts(self, start, end):
+    return bool(self.overlapping(start, end))
+
+  def add(self, start, end):
+    insort(self.bookings, (start, end))
+
+
+class BookingIndex:
+  '''
+  calendars keyed by ('venue', id) or ('artist', id), each loaded on first
+  use through load(key), which returns that key's (start, end) bookings
+  '''
+
+  def __init__(self, load):
+    self.load = load
+    self.calendars = {}
+    self.lock = threading.Lock()
+
+  def _calendar(self, key):
+    calendar = self.calendars.get(key)
+    if calendar is None:
+      calendar = self.calendars[key] = Calendar(self.load(key))
+    return calendar
+
+  def conflicts(self, keys, start, end):
+    # the keys among the given ones that are already booked at that time
+    with self.lock:
+      return [key for key in keys if self._calendar(key).conflicts(start, end)]
+
+  def add(self, keys, start, end):
+    with self.lock:
+      for key in keys:
+        if key in self.calendars:
+          self.calendars[key].add(start, end)
+
+  def discard(self, *keys):
+    with self.lock:
+      for key in keys:
+        self.calendars.pop(key, None)
+
+  def clear(self):
+    with self.lock:
+      self.calendars.clear()
+
+
+def free_slots(bookings, range_start, range_end, min_duration=timedelta(0)):
+  # gaps of at least min_duration between (start, end) bookings sorted by start
+  slots = []
+  cursor = range_start
+  for start, end in bookings:
+    gap_end = min(start, range_end)
+    if gap_end > cursor and gap_end - cursor >= min_duration:
+      slots.append((cursor, gap_end))
+    cursor = max(cursor, end)
+    if cursor >= range_end:
+      return slots
+  if range_end > cursor and range_end - cursor >= min_duration:
+    slots.append((cursor, range_end))
+  return slots
@@ -0,0 +1,217 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import request, session
+
+#----------------------------------------------------------------------------#
+# Cache backends.
+#
+# Every backend has the same get/set/delete interface; get returns None for
+# a missing or expired key. A ttl of 0 means the entry never expires.
+#----------------------------------------------------------------------------#
+
+# prefix of FileSystemCache's files still being written
+TMP_PREFIX = 'tmp'
+
+class LRUCache:
+  '''
+  entries in this process's memory. Invalidation only reaches this process:
+  with several workers, the others keep serving their copy of a page until
+  its ttl runs out. Use the filesystem or Redis backend for those.
+  '''
+
+  def __init__(self, max_entries=512, ttl=300):
+    self.max_entries = max_entries
+    self.ttl = ttl
+    self.entries = OrderedDict()
+    self.lock = threading.Lock()
+
+  def get(self, key):
+    with self.lock:
+      entry = self.entries.get(key)
+      if entry is None:
+        return None
+      expires, value = entry
+      if expires and expires < time.monotonic():
+        del self.entries[key]
+        return None
+      self.entries.move_to_end(key)
+      return value
+
+  def set(self, key, value, ttl=None):
+    ttl = self.ttl if ttl is None else ttl
+    expires = time.monotonic() + ttl if ttl else 0
+    with self.lock:
+      self.entries[key] = (expires, value)
+      self.entries.move_to_end(key)
+      while len(self.entries) > self.max_entries:
+        self.entries.popitem(last=False)
+
+  def delete(self, key):
+    with self.lock:
+      self.entries.pop(key, None)
+
+
+class FileSystemCache:
+  '''
+  one file per key, holding the expiry time and then the value as two
+  pickles, so sweep() can read the expiry without loading the value. set()
+  sweeps expired files out at most every sweep_interval seconds.
+  '''
+
+  def __init__(self, directory, ttl=300, sweep_interval=60):
+    self.directory = directory
+    self.ttl = ttl
+    self.sweep_interval = sweep_interval
+    self.swept_at = time.time()
+    os.makedirs(directory, exist_ok=True)
+
+  def _path(self, key):
+    return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+  def _expired(self, f):
+    expires = pickle.load(f)
+    return expires and expires < time.time()
+
+  def get(self, key):
+    try:
+      with open(self._path(key), 'rb') as f:
+        if not self._expired(f):
+          return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, TypeError):
+      return None
+    self.delete(key)
+    return None
+
+  def set(self, key, value, ttl=None):
+    ttl = self.ttl if ttl is None else ttl
+    expires = time.time() + ttl if ttl else 0
+    # write to a temporary file first so readers never see a partial entry
+    fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=TMP_PREFIX)
+    with os.fdopen(fd, 'wb') as f:
+      pickle.dump(expires, f, pickle.HIGHEST_PROTOCOL)
+      pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, self._path(key))
+    if time.time() - self.swept_at > self.sweep_interval:
+      self.sweep()
+
+  def sweep(self):
+    # deletes expired and unreadable entries; files being written are skipped
+    self.swept_at = time.time()
+    for entry in os.scandir(self.directory):
+      if not entry.is_file() or entry.name.startswith(TMP_PREFIX):
+        continue
+      try:
+        with open(entry.path, 'rb') as f:
+          stale = self._expired(f)
+      except FileNotFoundError:
+        continue
+      except (OSError, EOFError, pickle.UnpicklingError, TypeError):
+        stale = True
+      if stale:
+        try:
+          os.remove(entry.path)
+        except FileNotFoundError:
+          pass
+
+  def delete(self, key):
+    try:
+      os.remove(self._path(key))
+    except FileNotFoundError:
+      pass
+
+
+class RedisCache:
+  '''
+  client is anything with redis-py's get(key), set(key, value, ex=seconds)
+  and delete(key) methods, e.g. redis.Redis or a local stand-in
+  '''
+
+  def __init__(self, client, ttl=300, prefix='fyyur:'):
+    self.client = client
+    self.ttl = ttl
+    self.prefix = prefix
+
+  def get(self, key):
+    value = self.client.get(self.prefix + key)
+    return None if value is None else pickle.loads(value)
+
+  def set(self, key, value, ttl=None):
+    ttl = self.ttl if ttl is None else ttl
+    self.client.set(self.prefix + key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ex=ttl or None)
+
+  def delete(self, key):
+    self.client.delete(self.prefix + key)
+
+
+def backend_from_config(config):
+  cache_type = config.get('CACHE_TYPE', 'lru')
+  ttl = config.get('CACHE_DEFAULT_TIMEOUT', 300)
+  if cache_type == 'filesystem':
+    return FileSystemCache(config['CACHE_DIR'], ttl)
+  if cache_type == 'redis':
+    import redis
+    return RedisCache(redis.Redis.from_url(config['CACHE_REDIS_URL']), ttl)
+  return LRUCache(config.get('CACHE_MAX_ENTRIES', 512), ttl)
+
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#
+# Rendered pages are keyed by route path and query string, and stored with
+# the generation token their path had when they were rendered. Invalidating
+# a path replaces its token, so pages stored under the old one are misses;
+# the next render of each page overwrites its entry in place.
+#----------------------------------------------------------------------------#
+
+class PageCache:
+
+  def __init__(self, backend):
+    self.backend = backend
+
+  def _generation(self, path):
+    key = 'generation:' + path
+    generation = self.backend.get(key)
+    if generation is None:
+      # a lost token must never bring back pages cached under an older one
+      generation = uuid.uuid4().hex
+      self.backend.set(key, generation, ttl=0)
+    return generation
+
+  def key(self, path, args):
+    query = urlencode(sorted(args.items(multi=True)))
+    return 'page:{}?{}'.format(path, query)
+
+  def cached(self, view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+      # pages rendered with flashed messages are one-offs
+      if request.method != 'GET' or session.get('_flashes'):
+        return view(*args, **kwargs)
+
+      key = self.key(request.path, request.args)
+      # read before rendering, so an invalidation during the render leaves
+      # the new page marked stale
+      generation = self._generation(request.path)
+      entry = self.backend.get(key)
+      if entry is not None and entry[0] == generation:
+        return entry[1]
+
+      page = view(*args, **kwargs)
+      if isinstance(page, str):
+        self.backend.set(key, (generation, page))
+      return page
+
+    return wrapper
+
+  def invalidate(self, *paths):
+    for path in paths:
+      self.backend.set('generation:' + path, uuid.uuid4().hex, ttl=0)
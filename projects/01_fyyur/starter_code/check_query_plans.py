@@ -0,0 +1,149 @@
+'''
+Runs EXPLAIN for the queries behind each Fyyur view against a seeded
+PostgreSQL database and fails if any of them plans a sequential scan.
+
+    python check_query_plans.py [--venues N] [--artists N] [--shows N]
+
+The seed rows are inserted and analyzed inside a transaction that is
+rolled back at the end, so the configured database is left untouched.
+Run "flask db upgrade" first so the indexes under test exist.
+'''
+import argparse
+import json
+import random
+import sys
+from datetime import datetime, timedelta
+
+from app import (
+    app, db, Venue, Artist, Show, Genre, venue_genres, artist_genres, ITEMS_PER_PAGE,
+    venue_directory_query, VENUE_DIRECTORY_KEYS,
+    artist_listing_query, ARTIST_LISTING_KEYS,
+    upcoming_shows_query, UPCOMING_SHOWS_KEYS,
+    venue_detail_query, artist_detail_query,
+    search_query,
+)
+from pagination import keyset_query
+
+STATES = ['CA', 'NY', 'TX', 'WA', 'IL', 'LA', 'OR', 'MA']
+CITIES = ['Springfield', 'Riverside', 'Franklin', 'Greenville', 'Fairview', 'Salem']
+GENRES = ['Jazz', 'Blues', 'Rock n Roll', 'Folk', 'Soul', 'Punk', 'Classical']
+
+# a handful of rows on one page, where a sequential scan is the right plan
+LOOKUP_TABLES = {'Genre'}
+
+
+def seed(connection, venues, artists, shows):
+    now = datetime.now()
+    connection.execute(Venue.__table__.insert(), [{
+        'name': 'Venue %d' % i,
+        'city': random.choice(CITIES),
+        'state': random.choice(STATES),
+        'seeking_talent': False,
+    } for i in range(venues)])
+    connection.execute(Artist.__table__.insert(), [{
+        'name': 'Artist %d' % i,
+        'city': random.choice(CITIES),
+        'state': random.choice(STATES),
+    } for i in range(artists)])
+
+    venue_ids = [row[0] for row in connection.execute(db.select([Venue.id]))]
+    artist_ids = [row[0] for row in connection.execute(db.select([Artist.id]))]
+    connection.execute(Show.__table__.insert(), [{
+        'venue_id': random.choice(venue_ids),
+        'artist_id': random.choice(artist_ids),
+        'start_time': now + timedelta(hours=random.randint(-24 * 365, 24 * 365)),
+    } for _ in range(shows)])
+
+    genre_ids = {row.name: row.id for row in connection.execute(db.select([Genre.id, Genre.name]))}
+    missing = [{'name': name} for name in GENRES if name not in genre_ids]
+    if missing:
+        connection.execute(Genre.__table__.insert(), missing)
+        genre_ids = {row.name: row.id for row in connection.execute(db.select([Genre.id, Genre.name]))}
+    connection.execute(venue_genres.insert(), [
+        {'venue_id': venue_id, 'genre_id': genre_ids[random.choice(GENRES)]} for venue_id in venue_ids])
+    connection.execute(artist_genres.insert(), [
+        {'artist_id': artist_id, 'genre_id': genre_ids[random.choice(GENRES)]} for artist_id in artist_ids])
+
+    for table in ('Venue', 'Artist', 'Show', 'Genre', 'venue_genres', 'artist_genres'):
+        connection.execute('ANALYZE "%s"' % table)
+
+    return venue_ids[len(venue_ids) // 2], artist_ids[len(artist_ids) // 2]
+
+
+def view_queries(venue_id, artist_id):
+    now = datetime.now()
+    middle_venue = Venue.query.get(venue_id)
+    middle_artist = Artist.query.get(artist_id)
+    middle_show = Show.query.filter(Show.start_time >= now).order_by(Show.start_time).first()
+
+    def page(query, keys, values=None):
+        return keyset_query(query, keys, 'next', values).limit(ITEMS_PER_PAGE + 1)
+
+    return {
+        'venues': page(venue_directory_query(now), VENUE_DIRECTORY_KEYS),
+        'venues (later page)': page(
+            venue_directory_query(now), VENUE_DIRECTORY_KEYS,
+            [middle_venue.state, middle_venue.city, middle_venue.name, middle_venue.id]),
+        'venues?genre=': page(venue_directory_query(now, 'Jazz'), VENUE_DIRECTORY_KEYS),
+        'artists': page(artist_listing_query(), ARTIST_LISTING_KEYS),
+        'artists (later page)': page(
+            artist_listing_query(), ARTIST_LISTING_KEYS,
+            [middle_artist.name, middle_artist.id]),
+        'artists?genre=': page(artist_listing_query('Jazz'), ARTIST_LISTING_KEYS),
+        'shows': page(upcoming_shows_query(now), UPCOMING_SHOWS_KEYS),
+        'shows (later page)': page(
+            upcoming_shows_query(now), UPCOMING_SHOWS_KEYS,
+            [middle_show.start_time, middle_show.id]),
+        'show_venue': venue_detail_query(venue_id),
+        'show_artist': artist_detail_query(artist_id),
+        'search_venues': search_query(Venue, 'Venue 12').limit(ITEMS_PER_PAGE),
+        'search_artists': search_query(Artist, 'Artist 12').limit(ITEMS_PER_PAGE),
+    }
+
+
+def sequential_scans(plan):
+    if plan.get('Node Type') == 'Seq Scan':
+        yield plan.get('Relation Name')
+    for child in plan.get('Plans', []):
+        yield from sequential_scans(child)
+
+
+def explain(connection, query):
+    compiled = query.statement.compile(dialect=connection.dialect)
+    result = connection.execute('EXPLAIN (FORMAT JSON) ' + str(compiled), compiled.params)
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--venues', type=int, default=5000)
+    parser.add_argument('--artists', type=int, default=5000)
+    parser.add_argument('--shows', type=int, default=200000)
+    args = parser.parse_args()
+
+    failed = False
+    with app.app_context():
+        if db.engine.dialect.name != 'postgresql':
+            sys.exit('check_query_plans.py needs a PostgreSQL database')
+
+        connection = db.session.connection()
+        try:
+            venue_id, artist_id = seed(connection, args.venues, args.artists, args.shows)
+            for name, query in view_queries(venue_id, artist_id).items():
+                scans = sorted(set(sequential_scans(explain(connection, query))) - LOOKUP_TABLES)
+                if scans:
+                    failed = True
+                    print('FAIL %-22s sequential scan on %s' % (name, ', '.join(scans)))
+                else:
+                    print('ok   %s' % name)
+        finally:
+            db.session.rollback()
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import dateutil.parser
+from babel import Locale
+from babel.dates import parse_pattern, get_date_format, get_datetime_format, get_time_format, LC_TIME
+
+#----------------------------------------------------------------------------#
+# Datetime formatting.
+#
+# Views hand templates native datetimes, which are formatted without being
+# parsed again. Babel patterns are compiled once per (format, locale) and
+# reused for every row of a page.
+#----------------------------------------------------------------------------#
+
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+# babel's named formats, resolved through the locale unless overridden above
+NAMED_FORMATS = ('short', 'medium', 'long', 'full')
+
+def resolve_format(format, locale):
+  if format in DATETIME_FORMATS:
+    return DATETIME_FORMATS[format]
+  if format in NAMED_FORMATS:
+    # e.g. '{1}, {0}' with the locale's date pattern for {1} and time for {0}
+    return get_datetime_format(format, locale=locale) \
+      .replace('{0}', get_time_format(format, locale=locale).pattern) \
+      .replace('{1}', get_date_format(format, locale=locale).pattern)
+  return format
+
+@lru_cache(maxsize=64)
+def compiled_pattern(format, locale):
+  locale = Locale.parse(locale)
+  return parse_pattern(resolve_format(format, locale)), locale
+
+def format_datetime(value, format='medium', locale=None):
+  if not isinstance(value, datetime):
+    value = dateutil.parser.parse(value)
+  if value.tzinfo is None:
+    # babel.dates.format_datetime treats naive datetimes as UTC too
+    value = value.replace(tzinfo=timezone.utc)
+  pattern, locale = compiled_pattern(format, locale or LC_TIME)
+  return pattern.apply(value, locale)
@@ -0,0 +1,73 @@
+import csv
+import json
+from itertools import islice
+
+from werkzeug.datastructures import MultiDict
+
+#----------------------------------------------------------------------------#
+# Streaming readers for the bulk import command.
+#
+# Records are read lazily, one line at a time, so files of any size are
+# imported in constant memory.
+#----------------------------------------------------------------------------#
+
+# separator for list fields (genres) in CSV cells
+LIST_SEPARATOR = ';'
+
+
+def file_format(path):
+  return 'ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+def read_records(path, format=None):
+  '''
+  yields (line number, record, error) for every record of a CSV file with a
+  header row or of a newline-delimited JSON file; record is None when the
+  line could not be decoded
+  '''
+  format = format or file_format(path)
+  with open(path, newline='', encoding='utf-8') as f:
+    if format == 'csv':
+      reader = csv.DictReader(f)
+      for record in reader:
+        yield reader.line_num, record, None
+      return
+
+    for line_no, line in enumerate(f, start=1):
+      if not line.strip():
+        continue
+      try:
+        record = json.loads(line)
+      except ValueError as e:
+        yield line_no, None, 'invalid JSON: {}'.format(e)
+        continue
+      if not isinstance(record, dict):
+        yield line_no, None, 'expected a JSON object'
+        continue
+      yield line_no, record, None
+
+def chunked(iterable, size):
+  iterator = iter(iterable)
+  while True:
+    chunk = list(islice(iterator, size))
+    if not chunk:
+      return
+    yield chunk
+
+def to_formdata(record, list_fields=()):
+  # shapes a CSV or JSON record like the form data a browser would post
+  formdata = MultiDict()
+  for key, value in record.items():
+    if value is None or key is None:
+      continue
+    if key in list_fields:
+      if isinstance(value, str):
+        value = [item.strip() for item in value.split(LIST_SEPARATOR)]
+      for item in value:
+        if item:
+          formdata.add(key, str(item))
+    else:
+      formdata.add(key, str(value))
+  return formdata
+
+def format_errors(errors):
+  return '; '.join('{}: {}'.format(field, ', '.join(messages)) for field, messages in errors.items())
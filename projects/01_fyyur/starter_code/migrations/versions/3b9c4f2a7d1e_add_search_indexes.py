@@ -0,0 +1,48 @@
+"""add trigram search indexes for venues and artists
+
+Revision ID: 3b9c4f2a7d1e
+Revises: e35a6c394874
+Create Date: 2021-02-14 18:02:11.402316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9c4f2a7d1e'
+down_revision = 'e35a6c394874'
+branch_labels = None
+depends_on = None
+
+
+# must match search_document() in app.py so the planner can use the index
+def search_document(table):
+    return (
+        "coalesce(\"{0}\".name, '') || ' ' || "
+        "coalesce(\"{0}\".city, '') || ' ' || "
+        "coalesce(\"{0}\".state, '') || ' ' || "
+        "coalesce(\"{0}\".genres, '')"
+    ).format(table)
+
+
+def upgrade():
+    # columns the models gained after the initial revision
+    op.add_column('Venue', sa.Column('genres', sa.String(length=120), nullable=True))
+    op.add_column('Artist', sa.Column('seeking_venue', sa.Boolean(), nullable=True))
+    op.add_column('Artist', sa.Column('seeking_description', sa.String(length=500), nullable=True))
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('Venue', 'Artist'):
+        op.execute(
+            'CREATE INDEX "ix_{0}_search_trgm" ON "{0}" '
+            'USING gin (({1}) gin_trgm_ops)'.format(table, search_document(table))
+        )
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS "ix_Artist_search_trgm"')
+    op.execute('DROP INDEX IF EXISTS "ix_Venue_search_trgm"')
+    op.drop_column('Artist', 'seeking_description')
+    op.drop_column('Artist', 'seeking_venue')
+    op.drop_column('Venue', 'genres')
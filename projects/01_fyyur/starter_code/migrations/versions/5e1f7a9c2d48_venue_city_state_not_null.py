@@ -0,0 +1,31 @@
+"""make Venue city and state NOT NULL
+
+Revision ID: 5e1f7a9c2d48
+Revises: f3e8a1b6c902
+Create Date: 2021-03-13 09:41:22.614093
+
+The venue directory pages on (state, city, name, id); a venue with a NULL
+city or state fails every cursor comparison and never shows up past the
+first page. Existing NULLs become empty strings.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e1f7a9c2d48'
+down_revision = 'f3e8a1b6c902'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for column in ('city', 'state'):
+        op.execute('UPDATE "Venue" SET {0} = \'\' WHERE {0} IS NULL'.format(column))
+        op.alter_column('Venue', column, existing_type=sa.String(length=120), nullable=False)
+
+
+def downgrade():
+    for column in ('state', 'city'):
+        op.alter_column('Venue', column, existing_type=sa.String(length=120), nullable=True)
@@ -0,0 +1,44 @@
+"""create Show table and the listing indexes
+
+Revision ID: 8d2e61c4f0ab
+Revises: 3b9c4f2a7d1e
+Create Date: 2021-02-20 11:47:36.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2e61c4f0ab'
+down_revision = '3b9c4f2a7d1e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('Show',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # venue and artist detail pages, and the per-venue upcoming show counts
+    op.create_index('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], unique=False)
+    # keyset ordered listings: upcoming shows, the venue directory and artists
+    op.create_index('ix_Show_start_time', 'Show', ['start_time', 'id'], unique=False)
+    op.create_index('ix_Venue_state_city_name', 'Venue', ['state', 'city', 'name', 'id'], unique=False)
+    op.create_index('ix_Artist_name', 'Artist', ['name', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Artist_name', table_name='Artist')
+    op.drop_index('ix_Venue_state_city_name', table_name='Venue')
+    op.drop_index('ix_Show_start_time', table_name='Show')
+    op.drop_index('ix_Show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_Show_venue_id_start_time', table_name='Show')
+    op.drop_table('Show')
@@ -0,0 +1,116 @@
+"""store genres in a Genre table linked to venues and artists
+
+Revision ID: c7a4e9d15b20
+Revises: 8d2e61c4f0ab
+Create Date: 2021-02-27 16:31:05.772641
+
+"""
+import csv
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7a4e9d15b20'
+down_revision = '8d2e61c4f0ab'
+branch_labels = None
+depends_on = None
+
+
+OWNERS = (
+    ('Venue', 'venue_genres', 'venue_id'),
+    ('Artist', 'artist_genres', 'artist_id'),
+)
+
+
+def search_document(table, with_genres):
+    # the trigram search index expression before and after this revision
+    columns = ['name', 'city', 'state'] + (['genres'] if with_genres else [])
+    return " || ' ' || ".join(
+        "coalesce(\"{0}\".{1}, '')".format(table, column) for column in columns)
+
+
+def create_search_index(table, with_genres):
+    op.execute(
+        'CREATE INDEX "ix_{0}_search_trgm" ON "{0}" '
+        'USING gin (({1}) gin_trgm_ops)'.format(table, search_document(table, with_genres))
+    )
+
+
+def parse_genres(value):
+    # genres were saved from a list, so most rows hold an array literal
+    # such as {Jazz,"Rock n Roll"}; older rows hold a single name
+    if not value:
+        return []
+    value = value.strip()
+    if value.startswith('{') and value.endswith('}'):
+        value = value[1:-1]
+    return [name.strip() for name in next(csv.reader([value])) if name.strip()]
+
+
+def upgrade():
+    genre = op.create_table('Genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    for table, link_table, owner_column in OWNERS:
+        op.create_table(link_table,
+        sa.Column(owner_column, sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint([owner_column], [table + '.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ),
+        sa.PrimaryKeyConstraint(owner_column, 'genre_id')
+        )
+        op.create_index('ix_{}_genre_id_{}'.format(link_table, owner_column), link_table,
+                        ['genre_id', owner_column], unique=False)
+
+    # backfill from the old string columns
+    connection = op.get_bind()
+    owner_genres = {}
+    for table, link_table, owner_column in OWNERS:
+        rows = connection.execute(sa.text('SELECT id, genres FROM "{}"'.format(table)))
+        owner_genres[table] = [(row.id, parse_genres(row.genres)) for row in rows]
+
+    names = sorted({name for rows in owner_genres.values() for _, genres in rows for name in genres})
+    if names:
+        op.bulk_insert(genre, [{'name': name} for name in names])
+    genre_ids = dict((row.name, row.id) for row in connection.execute(sa.text('SELECT id, name FROM "Genre"')))
+
+    for table, link_table, owner_column in OWNERS:
+        links = sa.table(link_table, sa.column(owner_column), sa.column('genre_id'))
+        rows = [{owner_column: owner_id, 'genre_id': genre_ids[name]}
+                for owner_id, genres in owner_genres[table]
+                for name in set(genres)]
+        if rows:
+            op.bulk_insert(links, rows)
+
+        op.execute('DROP INDEX IF EXISTS "ix_{}_search_trgm"'.format(table))
+        op.drop_column(table, 'genres')
+        create_search_index(table, with_genres=False)
+
+
+def downgrade():
+    connection = op.get_bind()
+    for table, link_table, owner_column in OWNERS:
+        op.execute('DROP INDEX IF EXISTS "ix_{}_search_trgm"'.format(table))
+        op.add_column(table, sa.Column('genres', sa.String(length=120), nullable=True))
+
+        rows = connection.execute(sa.text(
+            'SELECT links.{0} AS owner_id, "Genre".name AS name FROM {1} AS links '
+            'JOIN "Genre" ON "Genre".id = links.genre_id '
+            'ORDER BY links.{0}, "Genre".name'.format(owner_column, link_table)))
+        owner_genres = {}
+        for row in rows:
+            owner_genres.setdefault(row.owner_id, []).append(row.name)
+        for owner_id, genres in owner_genres.items():
+            connection.execute(
+                sa.text('UPDATE "{}" SET genres = :genres WHERE id = :id'.format(table)),
+                genres='{' + ','.join('"%s"' % name if ' ' in name else name for name in genres) + '}',
+                id=owner_id)
+
+        create_search_index(table, with_genres=True)
+        op.drop_index('ix_{}_genre_id_{}'.format(link_table, owner_column), table_name=link_table)
+        op.drop_table(link_table)
+    op.drop_table('Genre')
@@ -0,0 +1,45 @@
+"""give shows a duration and reject overlapping bookings
+
+Revision ID: f3e8a1b6c902
+Revises: c7a4e9d15b20
+Create Date: 2021-03-06 10:12:48.530917
+
+Existing overlapping shows have to be resolved before upgrading, or
+adding the exclusion constraints fails.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3e8a1b6c902'
+down_revision = 'c7a4e9d15b20'
+branch_labels = None
+depends_on = None
+
+
+# the time a show occupies; start_time has no time zone, hence tsrange
+SHOW_RANGE = "tsrange(start_time, start_time + duration_minutes * interval '1 minute')"
+
+
+def upgrade():
+    op.add_column('Show', sa.Column('duration_minutes', sa.Integer(), server_default='120', nullable=False))
+    # the overlap checks in bookings.py assume no show is longer than a day
+    op.create_check_constraint(
+        'Show_duration_minutes_range', 'Show', 'duration_minutes BETWEEN 1 AND 1440')
+
+    # btree_gist lets the integer equality share a GiST index with the range overlap
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    for owner in ('venue', 'artist'):
+        op.execute(
+            'ALTER TABLE "Show" ADD CONSTRAINT "Show_{0}_no_overlap" '
+            'EXCLUDE USING gist ({0}_id WITH =, {1} WITH &&)'.format(owner, SHOW_RANGE)
+        )
+
+
+def downgrade():
+    op.execute('ALTER TABLE "Show" DROP CONSTRAINT "Show_artist_no_overlap"')
+    op.execute('ALTER TABLE "Show" DROP CONSTRAINT "Show_venue_no_overlap"')
+    op.drop_constraint('Show_duration_minutes_range', 'Show', type_='check')
+    op.drop_column('Show', 'duration_minutes')
@@ -0,0 +1,83 @@
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import tuple_
+
+#----------------------------------------------------------------------------#
+# Keyset pagination.
+#
+# Pages are addressed by an opaque cursor holding the sort key of the row
+# they start after (or end before), so fetching a page is an index range
+# scan whatever its position in the listing.
+#----------------------------------------------------------------------------#
+
+Page = namedtuple('Page', ['items', 'next_cursor', 'prev_cursor'])
+
+
+class InvalidCursor(ValueError):
+  pass
+
+
+def _encode_value(value):
+  if isinstance(value, datetime):
+    return {'dt': value.isoformat()}
+  return value
+
+def _decode_value(value):
+  if isinstance(value, dict):
+    return datetime.fromisoformat(value['dt'])
+  return value
+
+def encode_cursor(direction, values):
+  payload = json.dumps([direction, [_encode_value(value) for value in values]])
+  return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+  try:
+    direction, values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    if direction not in ('next', 'prev'):
+      raise ValueError(direction)
+    return direction, [_decode_value(value) for value in values]
+  except (TypeError, ValueError, KeyError) as e:
+    raise InvalidCursor(cursor) from e
+
+
+def keyset_query(query, keys, direction='next', values=None):
+  '''
+  keys are the columns the listing is ordered by, ascending, ending with a
+  unique column; values is the key of the row the page starts after (or,
+  going backwards, ends before)
+  '''
+  if direction == 'next':
+    if values is not None:
+      query = query.filter(tuple_(*keys) > tuple_(*values))
+    return query.order_by(*keys)
+  return query.filter(tuple_(*keys) < tuple_(*values)) \
+    .order_by(*[key.desc() for key in keys])
+
+
+def keyset_page(query, keys, cursor, per_page):
+  # each result row must expose the keys as attributes
+  direction, values = decode_cursor(cursor) if cursor else ('next', None)
+  if values is not None and len(values) != len(keys):
+    raise InvalidCursor(cursor)
+
+  query = keyset_query(query, keys, direction, values)
+  rows = query.limit(per_page + 1).all()
+  more = len(rows) > per_page
+  rows = rows[:per_page]
+
+  if direction == 'next':
+    has_next, has_prev = more, values is not None
+  else:
+    rows.reverse()
+    has_next, has_prev = True, more
+
+  def key_values(row):
+    return [getattr(row, key.key) for key in keys]
+
+  next_cursor = encode_cursor('next', key_values(rows[-1])) if rows and has_next else None
+  prev_cursor = encode_cursor('prev', key_values(rows[0])) if rows and has_prev else None
+
+  return Page(rows, next_cursor, prev_cursor)
@@ -0,0 +1,75 @@
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+#----------------------------------------------------------------------------#
+# In-process search index.
+#
+# Used when the database has no trigram support (e.g. SQLite test runs).
+# Documents are tokenized into lowercase words; a query matches a document
+# when every query word is a word, or the prefix of a word, of the document.
+#----------------------------------------------------------------------------#
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+EXACT_MATCH_SCORE = 2
+PREFIX_MATCH_SCORE = 1
+
+
+def tokenize(text):
+  if not text:
+    return []
+  return TOKEN_RE.findall(text.lower())
+
+
+class InvertedIndex:
+
+  def __init__(self):
+    self.postings = defaultdict(set)
+    self.vocabulary = []
+    self.stale = True
+
+  def build(self, documents):
+    # documents is an iterable of (id, text) pairs
+    postings = defaultdict(set)
+    for doc_id, text in documents:
+      for token in tokenize(text):
+        postings[token].add(doc_id)
+    self.postings = postings
+    self.vocabulary = sorted(postings)
+    self.stale = False
+
+  def invalidate(self):
+    self.stale = True
+
+  def _matches(self, word):
+    # scores for every document holding the word or a word starting with it
+    scores = {}
+    start = bisect_left(self.vocabulary, word)
+    for token in self.vocabulary[start:]:
+      if not token.startswith(word):
+        break
+      score = EXACT_MATCH_SCORE if token == word else PREFIX_MATCH_SCORE
+      for doc_id in self.postings[token]:
+        if scores.get(doc_id, 0) < score:
+          scores[doc_id] = score
+    return scores
+
+  def search(self, term):
+    # returns document ids ranked by score, best first
+    words = tokenize(term)
+    if not words:
+      return []
+
+    ranked = None
+    for word in words:
+      scores = self._matches(word)
+      if ranked is None:
+        ranked = scores
+      else:
+        ranked = {doc_id: ranked[doc_id] + score
+                  for doc_id, score in scores.items() if doc_id in ranked}
+      if not ranked:
+        return []
+
+    return sorted(ranked, key=lambda doc_id: (-ranked[doc_id], doc_id))
@@ -0,0 +1,71 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import babel.dates
+
+from app import app, db, Venue, Show, Artist
+from filters import format_datetime
+
+
+class FyyurTestCase(unittest.TestCase):
+    """Fyyur views, against an in-memory SQLite database"""
+
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['TESTING'] = True
+        self.client = app.test_client
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', seeking_talent=False)
+            artist = Artist(name='Guns N Petals', city='San Francisco', state='CA')
+            db.session.add_all([venue, artist])
+            db.session.commit()
+            db.session.add(Show(venue_id=venue.id, artist_id=artist.id,
+                start_time=datetime(2021, 3, 1, 19, 0), duration_minutes=120))
+            db.session.commit()
+            self.venue_id = venue.id
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_venue_availability(self):
+        res = self.client().get('/venues/{}/availability?start=2021-03-01T18:00&end=2021-03-01T23:00&min_minutes=30'.format(self.venue_id))
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['free_slots'], [
+            {'start': '2021-03-01T18:00:00', 'end': '2021-03-01T19:00:00'},
+            {'start': '2021-03-01T21:00:00', 'end': '2021-03-01T23:00:00'}
+        ])
+
+    def test_venue_availability_with_offset(self):
+        res = self.client().get('/venues/{}/availability'.format(self.venue_id),
+            query_string={'start': '2021-03-01T19:00+00:00', 'end': '2021-03-02T19:00+00:00'})
+
+        self.assertEqual(res.status_code, 400)
+
+
+class FormatDatetimeTestCase(unittest.TestCase):
+    """the datetime template filter"""
+
+    def test_named_format(self):
+        # spacing differs between CLDR versions, so compared with babel's own
+        value = datetime(2021, 3, 1, 19, 30)
+        expected = babel.dates.format_datetime(value.replace(tzinfo=timezone.utc), 'short', locale='en_US')
+
+        self.assertEqual(format_datetime(value, 'short', 'en_US'), expected)
+        self.assertTrue(expected.startswith('3/1/21, 7:30'))
+
+    def test_app_format(self):
+        self.assertEqual(format_datetime(datetime(2021, 3, 1, 19, 30), 'full', 'en_US'), 'Monday March, 1, 2021 at 7:30PM')
+
+    def test_pattern(self):
+        self.assertEqual(format_datetime('2021-03-01T19:30:00', 'yyyy-MM-dd HH:mm'), '2021-03-01 19:30')
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+'''
+Cost of picking the next quiz question from a large question bank.
+
+    python benchmarks/bench_quiz.py [--questions N] [--previous N] [--repeat N]
+
+"before" is what make_quiz used to do once the questions were loaded:
+format every question, filter out previous_questions with a list lookup
+and pick at random. "after" picks from the in-memory QuestionPool.
+'''
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from flaskr.quiz import QuestionPool
+
+CATEGORIES = 6
+DIFFICULTIES = 5
+
+
+def pick_before(questions, prev_questions):
+  questionsAvailable = []
+  for question in questions:
+    if question['id'] not in prev_questions:
+      questionsAvailable.append(dict(question))
+  return random.choice(questionsAvailable) if questionsAvailable else None
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--questions', type=int, default=1000000)
+  parser.add_argument('--previous', type=int, default=1000)
+  parser.add_argument('--repeat', type=int, default=3)
+  args = parser.parse_args()
+
+  rows = [(id, id % CATEGORIES + 1, id % DIFFICULTIES + 1) for id in range(1, args.questions + 1)]
+  questions = [{'id': id, 'question': 'Question %d' % id, 'answer': 'Answer', 'category': category, 'difficulty': difficulty}
+               for id, category, difficulty in rows]
+  prev_questions = random.sample(range(1, args.questions + 1), args.previous)
+  category_questions = [id for id, category, difficulty in rows if category == 1]
+
+  pool = QuestionPool(lambda: rows)
+  pool.pick()
+
+  cases = [
+    ('before (all categories)', 1, lambda: pick_before(questions, prev_questions)),
+    ('after (all categories)', 10000, lambda: pool.pick(exclude=set(prev_questions))),
+    ('after (one category)', 10000, lambda: pool.pick(1, set(prev_questions))),
+    ('after (one difficulty)', 10000, lambda: pool.pick(1, set(prev_questions), 3)),
+    ('after (category 99% played)', 10, lambda: pool.pick(1, set(category_questions[:-len(category_questions) // 100]))),
+  ]
+
+  print('%d questions, %d previous questions, best of %d' % (args.questions, args.previous, args.repeat))
+  for name, number, pick in cases:
+    best = min(timeit.repeat(pick, number=number, repeat=args.repeat)) / number
+    print('%-28s %12.1f us/pick' % (name, best * 1e6))
+
+
+if __name__ == '__main__':
+  main()
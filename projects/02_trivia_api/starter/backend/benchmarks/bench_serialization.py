@@ -0,0 +1,66 @@
+'''
+Cost of building a question list response at 1k, 10k and 100k rows.
+
+    python benchmarks/bench_serialization.py [--rows N ...] [--repeat N]
+
+"before" is what the list endpoints used to do: load Question objects,
+format() each one and jsonify the result. "after" selects plain column rows
+and encodes them with serialization.json_response (orjson when installed).
+Runs against an in-memory SQLite database.
+'''
+import argparse
+import os
+import sys
+import timeit
+
+from flask import Flask, jsonify
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from models import setup_db, db, Question, question_columns
+from flaskr.serialization import json_response, row_dicts, orjson
+
+
+def respond_before():
+  questions = [question.format() for question in Question.query.order_by(Question.id).all()]
+  response = jsonify({'success': True, 'questions': questions, 'total_questions': len(questions)})
+  # as at the end of a request, so every run builds its Question objects anew
+  db.session.expunge_all()
+  return response
+
+
+def respond_after():
+  questions = row_dicts(Question.query.with_entities(*question_columns).order_by(Question.id))
+  response = json_response({'success': True, 'questions': questions, 'total_questions': len(questions)})
+  db.session.expunge_all()
+  return response
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+  parser.add_argument('--repeat', type=int, default=3)
+  args = parser.parse_args()
+
+  app = Flask(__name__)
+  setup_db(app, 'sqlite://')
+
+  print('encoder: %s, best of %d' % ('orjson' if orjson else 'json', args.repeat))
+  with app.test_request_context():
+    loaded = 0
+    for rows in sorted(args.rows):
+      db.session.execute(Question.__table__.insert(), [{
+        'question': 'Question %d' % i,
+        'answer': 'Answer %d' % i,
+        'category': i % 6 + 1,
+        'difficulty': i % 5 + 1,
+      } for i in range(loaded, rows)])
+      db.session.commit()
+      loaded = rows
+
+      before = min(timeit.repeat(respond_before, number=1, repeat=args.repeat))
+      after = min(timeit.repeat(respond_after, number=1, repeat=args.repeat))
+      print('%7d rows   before %8.1f ms   after %8.1f ms   %.1fx' % (rows, before * 1000, after * 1000, before / after))
+
+
+if __name__ == '__main__':
+  main()
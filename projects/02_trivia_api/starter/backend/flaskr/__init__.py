@@ -1,29 +1,142 @@
 import os
-from flask import Flask, request, abort, jsonify
+from flask import Flask, Response, request, abort, stream_with_context
+from werkzeug.exceptions import HTTPException
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func
 from flask_cors import CORS
-import random
 
-from models import setup_db, Question, Category
+from models import setup_db, db, Question, Category, question_columns, question_listeners, category_listeners, notify, MIN_DIFFICULTY, MAX_DIFFICULTY
+from .categories import CategoryRegistry
+from .search import PostgresSearch, MemorySearch, has_search_vector
+from .bulk import import_questions, export_questions
+from .counts import RowCounter
+from .quiz import QuestionPool, QuizSession, SessionStore, ALL_CATEGORIES
+from .serialization import json_response, row_dicts
 
-# function to paginate questions and use a parameter to define number of questions per page
+# Paginator that runs in the database: only the requested page is loaded. The
+# query should select plain columns, e.g. question_columns, which are turned
+# into dicts without building ORM objects.
 
 QUESTIONS_PER_PAGE = 10
 
-def paginate_questions(request, selection):
+def paginate(request, query, per_page=QUESTIONS_PER_PAGE):
   page = request.args.get('page', 1, type=int)
-  start =  (page - 1) * QUESTIONS_PER_PAGE
-  end = start + QUESTIONS_PER_PAGE
+  if page < 1:
+    return []
 
-  questions = [question.format() for question in selection]
-  current_questions = questions[start:end]
+  rows = query.limit(per_page).offset((page - 1) * per_page).all()
 
-  return current_questions
+  return row_dicts(rows)
+
+# Write responses are minimal, the affected id and the question count, when
+# the client asks with ?response=minimal or a "Prefer: return=minimal" header.
+# From API version 2 (an X-API-Version: 2 header) they are minimal unless the
+# client asks for ?response=full or "Prefer: return=representation".
+
+API_VERSION_HEADER = 'X-API-Version'
+MINIMAL_RESPONSE_VERSION = 2
+
+def wants_minimal_response(request):
+  mode = request.args.get('response')
+  if mode in ('minimal', 'full'):
+    return mode == 'minimal'
+
+  prefer = request.headers.get('Prefer', '')
+  if 'return=minimal' in prefer:
+    return True
+  if 'return=representation' in prefer:
+    return False
+
+  return request.headers.get(API_VERSION_HEADER, 1, type=int) >= MINIMAL_RESPONSE_VERSION
+
+# Quiz questions are picked from an in-memory pool of (id, category, difficulty) rows,
+# kept in step by the question listeners and reloaded every QUIZ_POOL_TTL seconds.
+
+QUIZ_POOL_TTL = 300
+
+def load_quiz_questions():
+  return Question.query.with_entities(Question.id, Question.category, Question.difficulty).all()
+
+quiz_pool = QuestionPool(load_quiz_questions, ttl=QUIZ_POOL_TTL)
+
+def update_quiz_pool(event, question):
+  if event == 'reload':
+    quiz_pool.clear()
+  elif event == 'delete':
+    quiz_pool.discard(question.id)
+  else:
+    quiz_pool.add(question.id, question.category, question.difficulty)
+
+question_listeners.append(update_quiz_pool)
+
+def quiz_category_key(category):
+  # the frontend sends category ids as strings, and 0 for all categories
+  category_id = int(category['id'])
+  return category_id if category_id != 0 else ALL_CATEGORIES
+
+# Quiz sessions expire after an hour without a turn; the oldest are evicted
+# past QUIZ_MAX_SESSIONS. Set QUIZ_SESSION_STORE in the app config to keep
+# them somewhere other than process memory.
+
+QUIZ_SESSION_TTL = 3600
+QUIZ_MAX_SESSIONS = 100000
+
+# The category map is shared by every endpoint and reloaded after category
+# writes, or every CATEGORY_TTL seconds.
+
+CATEGORY_TTL = 300
+
+def load_categories():
+  return Category.query.with_entities(Category.id, Category.type).order_by(Category.id).all()
+
+category_registry = CategoryRegistry(load_categories, ttl=CATEGORY_TTL)
+
+category_listeners.append(category_registry.invalidate)
+
+# Search runs on the GIN-indexed search_vector column where the database has
+# it, otherwise on an in-memory index kept in step with this process's writes.
+
+def load_search_documents():
+  return Question.query.with_entities(Question.id, Question.category, Question.question, Question.answer).all()
+
+memory_search = MemorySearch(load_search_documents)
+
+def update_memory_search(event, question):
+  if event == 'reload':
+    memory_search.clear()
+  elif event == 'delete':
+    memory_search.discard(question.id)
+  else:
+    memory_search.add(question.id, question.category, question.question, question.answer)
+
+question_listeners.append(update_memory_search)
+
+# The question count is kept in memory and maintained by the question
+# listeners; it is recounted every QUESTION_COUNT_TTL seconds.
+
+QUESTION_COUNT_TTL = 300
+
+def count_questions():
+  return db.session.query(func.count(Question.id)).scalar()
+
+question_count = RowCounter(count_questions, ttl=QUESTION_COUNT_TTL)
+
+question_listeners.append(question_count.on_event)
 
 def create_app(test_config=None):
   # create and configure the app
   app = Flask(__name__)
+  if test_config:
+    app.config.from_mapping(test_config)
   setup_db(app)
+  quiz_pool.clear()
+  category_registry.invalidate()
+  memory_search.clear()
+  question_count.clear()
+  with app.app_context():
+    category_registry.current()
+    question_search = PostgresSearch() if has_search_vector(db.engine) else memory_search
+  quiz_sessions = app.config.get('QUIZ_SESSION_STORE') or SessionStore(QUIZ_SESSION_TTL, QUIZ_MAX_SESSIONS)
   cors = CORS(app, resources={r"/api/*": {"origins": "*"}})
   @app.after_request
   def after_request(response):
@@ -36,16 +149,16 @@ def create_app(test_config=None):
   @app.route('/categories')
   def retrieve_categories():
     try:
-        cats = Category.query.all()
-        allcats = {cat.id:cat.type for cat in cats}
+        snapshot = category_registry.current()
 
-        if len(cats) == 0:
+        if len(snapshot.categories) == 0:
           abort(404)
 
-        return jsonify ({
-            'success': True,
-            'categories' : allcats
-        })
+        # the body was encoded when the map was loaded; a client whose
+        # If-None-Match matches the map's etag gets a bodiless 304
+        response = app.response_class(snapshot.body, mimetype='application/json')
+        response.set_etag(snapshot.etag)
+        return response.make_conditional(request)
     except Exception as e:
         print(e)
         abort(422)
@@ -56,22 +169,22 @@ def create_app(test_config=None):
   @app.route('/questions')
   def retrieve_questions():
     try:
-        questions = Question.query.order_by(Question.id).all()
-        current_questions = paginate_questions(request, questions)
+        questions = Question.query.with_entities(*question_columns).order_by(Question.id)
+        current_questions = paginate(request, questions)
 
         if len(current_questions) == 0:
           abort(404)
 
-        cats = Category.query.order_by(Category.id).all()
-        allcategories = {cat.id:cat.type for cat in cats}
-
-        return jsonify ({
+        return json_response ({
           'success': True,
           'questions': current_questions,
-          'total_questions': len(Question.query.all()),
+          'total_questions': question_count.value(),
           'current_category' : None,
-          'categories' : allcategories
+          'categories' : category_registry.categories
         })
+    except HTTPException:
+        # the 404 for a page past the end
+        raise
     except Exception as e:
         print(e)
         abort(422)
@@ -88,19 +201,23 @@ def create_app(test_config=None):
 
       question.delete()
 
-      questions = Question.query.order_by(Question.id).all()
-      current_questions = paginate_questions(request, questions)
+      if wants_minimal_response(request):
+        return json_response({
+          'success': True,
+          'deleted': question_id,
+          'total_questions': question_count.value()
+        })
 
-      cats = Category.query.order_by(Category.id).all()
-      allcategories = {cat.id:cat.type for cat in cats}
+      questions = Question.query.with_entities(*question_columns).order_by(Question.id)
+      current_questions = paginate(request, questions)
 
-      return jsonify({
+      return json_response({
         'success': True,
         'deleted': question_id,
         'questions': current_questions,
-        'total_questions': len(Question.query.all()),
+        'total_questions': question_count.value(),
         'current_category' : None,
-        'categories' : allcategories
+        'categories' : category_registry.categories
       })
 
     except Exception as e:
@@ -124,19 +241,23 @@ def create_app(test_config=None):
       question = Question(question=new_question, answer=new_answer, difficulty=new_difficulty, category=new_category)
       question.insert()
 
-      questions = Question.query.order_by(Question.id).all()
-      current_questions = paginate_questions(request, questions)
+      if wants_minimal_response(request):
+        return json_response({
+            'success': True,
+            'question_id': question.id,
+            'total_questions': question_count.value()
+        })
 
-      cats = Category.query.order_by(Category.id).all()
-      allcategories = {cat.id:cat.type for cat in cats}
+      questions = Question.query.with_entities(*question_columns).order_by(Question.id)
+      current_questions = paginate(request, questions)
 
-      return jsonify ({
+      return json_response({
           'success': True,
           'question_id': question.id,
           'question_created': question.question,
           'questions': current_questions,
-          'total_questions': len(Question.query.all()),
-          'category' : allcategories
+          'total_questions': question_count.value(),
+          'category' : category_registry.categories
       })
 
     except Exception as e:
@@ -144,29 +265,63 @@ def create_app(test_config=None):
         abort(404)
 
 
-  # Endpoint to get questions based on a search term, returns any questions
-  # for which the search term is a substring of the question.
+  # Endpoint to import questions in bulk. The body is newline-delimited JSON,
+  # one question object per line, read as it arrives and inserted in batches.
+  # Lines that are not valid questions are skipped and reported.
+
+  @app.route('/questions/bulk', methods=['POST'])
+  def import_question_bulk():
+    try:
+      inserted, rejected, errors = import_questions(request.stream, category_registry.categories)
+    except Exception as e:
+      print(e)
+      abort(422)
+    finally:
+      notify(question_listeners, 'reload', None)
+
+    return json_response({
+      'success': True,
+      'inserted': inserted,
+      'rejected': rejected,
+      'errors': [{'line': line_no, 'error': error} for line_no, error in errors]
+    })
+
+  # Endpoint to export every question as newline-delimited JSON, streamed so
+  # the whole bank is never held in memory.
+
+  @app.route('/questions/export')
+  def export_question_bank():
+    return Response(stream_with_context(export_questions()), mimetype='application/x-ndjson')
+
+  # Endpoint to get questions based on a search term, returns a page of the
+  # questions whose question or answer contains every word of the search term,
+  # or a word starting with it, best matches first. Optionally limited to one
+  # category.
 
   @app.route('/questions/search', methods=['POST'])
   def search_questions():
 
     body = request.get_json()
     search = body.get('searchTerm', None)
+    category = body.get('category', None)
+    page = request.args.get('page', 1, type=int)
 
     if search:
       try:
-          searchResult = Question.query.filter(Question.question.ilike(f'%{search}%')).all()
+          category_id = int(category) if category else None
+          offset = (max(page, 1) - 1) * QUESTIONS_PER_PAGE
+          searchResult, total = question_search.search(search, category_id, offset, QUESTIONS_PER_PAGE)
 
           questions = []
           for question in searchResult:
              questions.append(question.format())
 
 
-          return jsonify ({
+          return json_response({
             'success' : True,
             'questions' : questions,
-            'total_questions' : len(searchResult),
-            'current_category' : None
+            'total_questions' : total,
+            'current_category' : category_id
           })
 
       except Exception as e:
@@ -179,16 +334,13 @@ def create_app(test_config=None):
   @app.route('/categories/<int:category_id>/questions', methods=['GET'])
   def get_categoryquestions(category_id):
     try:
-      cat_questions = Question.query.filter(Question.category == str(category_id)).all()
+      questions = row_dicts(Question.query.with_entities(*question_columns)
+        .filter(Question.category == category_id).order_by(Question.id))
 
-      questions = []
-      for question in cat_questions:
-        questions.append(question.format())
-
-      return jsonify({
+      return json_response({
             'success': True,
             'questions': questions,
-            'total_questions': len(cat_questions),
+            'total_questions': len(questions),
             'current_category': category_id
         })
 
@@ -196,36 +348,92 @@ def create_app(test_config=None):
         print(e)
         abort(422)
 
+  # Endpoint to start a quiz session. The session remembers the category and
+  # the questions already asked, so later /quizzes calls only send its token.
+  # An adaptive session starts at the given difficulty (or the easiest) and
+  # follows the player's streak of correct answers.
+
+  @app.route('/quizzes/sessions', methods=['POST'])
+  def start_quiz():
+    body = request.get_json(silent=True) or {}
+    category = body.get('quiz_category', None) or {'id': 0}
+    difficulty = body.get('difficulty', None)
+    if difficulty is None and body.get('adaptive', False):
+      difficulty = MIN_DIFFICULTY
+
+    try:
+        if difficulty is not None:
+          difficulty = int(difficulty)
+          if not MIN_DIFFICULTY <= difficulty <= MAX_DIFFICULTY:
+            abort(422)
+
+        quiz_session = QuizSession(quiz_category_key(category), difficulty)
+        token = quiz_sessions.create(quiz_session)
+
+        return json_response({
+            'success': True,
+            'session': token
+          })
+
+    except Exception as e:
+        print(e)
+        abort(422)
+
+  @app.route('/quizzes/sessions/<token>', methods=['DELETE'])
+  def end_quiz(token):
+    quiz_sessions.delete(token)
+
+    return json_response({
+        'success': True,
+        'deleted': token
+      })
+
   # Dndpoint to get questions to play the quiz.  This endpoint takes category and previous question parameters
   # and returns a random questions within the given category, if provided, and not one of the previous questions.
+  # Given a session token instead, it takes both from the session; adaptive
+  # sessions also take whether the previous question was answered correctly.
 
   @app.route('/quizzes', methods=['POST'])
   def make_quiz():
     body = request.get_json()
+    token = body.get('session', None)
     prev_questions = body.get('previous_questions', None)
     category = body.get('quiz_category', None)
 
     try:
-
-        if category['id'] != 0:
-            questionSet = Question.query.filter_by(category = category['id']).all()
+        if token is not None:
+            quiz_session = quiz_sessions.get(token)
+            if quiz_session is None:
+                abort(404)
+            if 'correct' in body:
+                quiz_session.record_answer(bool(body['correct']))
+            category_key = quiz_session.category
+            seen = quiz_session.seen
+            difficulty = quiz_session.difficulty
         else:
-            questionSet = Question.query.all()
+            quiz_session = None
+            category_key = quiz_category_key(category)
+            seen = set(prev_questions)
+            difficulty = None
 
-        questionsAvailable = []
+        question_id = quiz_pool.pick(category_key, seen, difficulty)
 
-        for question in questionSet:
-            if question.id not in prev_questions:
-                questionsAvailable.append(question.format())
+        question = Question.query.get(question_id) if question_id is not None else None
 
-        if len(questionsAvailable) > 0:
-            randomQuestion = random.choice(questionsAvailable)
-            return jsonify({
+        if question is not None:
+            if quiz_session is not None:
+                seen.add(question.id)
+                quiz_sessions.save(token, quiz_session)
+            response = {
                 'success': True,
-                'question': randomQuestion
-              })
+                'question': question.format()
+              }
+            if difficulty is not None:
+                response['difficulty'] = difficulty
+                response['streak'] = quiz_session.streak
+            return json_response(response)
         else:
-            return jsonify({
+            return json_response({
                 'success': False,
                 'question': None
               })
@@ -239,7 +447,7 @@ def create_app(test_config=None):
 
   @app.errorhandler(400)
   def bad_request(error):
-    return jsonify({
+    return json_response({
       "success": False,
       "error": 400,
       "message": "bad request"
@@ -247,7 +455,7 @@ def create_app(test_config=None):
 
   @app.errorhandler(404)
   def not_found(error):
-    return jsonify({
+    return json_response({
       "success": False,
       "error": 404,
       "message": "resource not found"
@@ -255,7 +463,7 @@ def create_app(test_config=None):
 
   @app.errorhandler(405)
   def not_found(error):
-    return jsonify({
+    return json_response({
       "success": False,
       "error": 405,
       "message": "method not allowed"
@@ -263,7 +471,7 @@ def create_app(test_config=None):
 
   @app.errorhandler(422)
   def unprocessable(error):
-    return jsonify({
+    return json_response({
       "success": False,
       "error": 422,
       "message": "unprocessable"
@@ -271,7 +479,7 @@ def create_app(test_config=None):
 
   @app.errorhandler(500)
   def unprocessable(error):
-    return jsonify({
+    return json_response({
       "success": False,
       "error": 500,
       "message": "internal server error"
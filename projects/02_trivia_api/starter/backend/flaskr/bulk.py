@@ -0,0 +1,132 @@
+from itertools import islice
+
+from models import db, Question, question_columns, MIN_DIFFICULTY, MAX_DIFFICULTY
+from .serialization import dumps, loads
+
+# Bulk import and export of questions as newline-delimited JSON, one question
+# object per line, read and written a line at a time so content packs of any
+# size go through in constant memory.
+
+BATCH_SIZE = 1000
+# rejected lines past this many are counted but not kept or reported
+MAX_REPORTED_ERRORS = 100
+
+
+def read_lines(stream):
+  # yields (line number, record, error) for every non-blank line
+  for line_no, line in enumerate(stream, start=1):
+    if not line.strip():
+      continue
+    try:
+      record = loads(line)
+    except ValueError as e:
+      yield line_no, None, 'invalid JSON: {}'.format(e)
+      continue
+    if not isinstance(record, dict):
+      yield line_no, None, 'expected a JSON object'
+      continue
+    yield line_no, record, None
+
+
+def question_values(record, categories):
+  # the insert values for a question record, or an error message
+  values = {}
+  for field in ('question', 'answer'):
+    value = record.get(field)
+    if not isinstance(value, str) or not value.strip():
+      return None, '{} is required'.format(field)
+    values[field] = value
+
+  try:
+    values['category'] = int(record.get('category'))
+  except (TypeError, ValueError):
+    return None, 'category must be a category id'
+  if values['category'] not in categories:
+    return None, 'no category {}'.format(values['category'])
+
+  try:
+    values['difficulty'] = int(record.get('difficulty'))
+  except (TypeError, ValueError):
+    return None, 'difficulty must be a number'
+  if not MIN_DIFFICULTY <= values['difficulty'] <= MAX_DIFFICULTY:
+    return None, 'difficulty must be between {} and {}'.format(MIN_DIFFICULTY, MAX_DIFFICULTY)
+
+  return values, None
+
+
+def chunked(iterable, size):
+  iterator = iter(iterable)
+  while True:
+    chunk = list(islice(iterator, size))
+    if not chunk:
+      return
+    yield chunk
+
+
+def insert_batch(batch):
+  # inserts [(line number, values)] in one transaction; if that fails, row by
+  # row, so one bad row does not lose the rest. Returns the rows' errors.
+  try:
+    db.session.execute(Question.__table__.insert(), [values for line_no, values in batch])
+    db.session.commit()
+    return []
+  except Exception:
+    db.session.rollback()
+
+  errors = []
+  for line_no, values in batch:
+    try:
+      db.session.execute(Question.__table__.insert(), values)
+      db.session.commit()
+    except Exception as e:
+      db.session.rollback()
+      errors.append((line_no, str(getattr(e, 'orig', e))))
+  return errors
+
+
+def import_questions(stream, categories, batch_size=BATCH_SIZE, max_errors=MAX_REPORTED_ERRORS):
+  '''
+  inserts the questions of an NDJSON stream in transactions of batch_size
+  rows; returns the number inserted, the number rejected and the (line
+  number, error) of the first max_errors rejected lines
+  '''
+  inserted = 0
+  rejected = 0
+  errors = []
+
+  def reject(line_no, error):
+    nonlocal rejected
+    rejected += 1
+    if len(errors) < max_errors:
+      errors.append((line_no, error))
+
+  def valid_rows():
+    for line_no, record, error in read_lines(stream):
+      if error is None:
+        values, error = question_values(record, categories)
+      if error is None:
+        yield line_no, values
+      else:
+        reject(line_no, error)
+
+  for batch in chunked(valid_rows(), batch_size):
+    batch_errors = insert_batch(batch)
+    inserted += len(batch) - len(batch_errors)
+    for line_no, error in batch_errors:
+      reject(line_no, error)
+
+  return inserted, rejected, errors
+
+
+def export_questions(batch_size=BATCH_SIZE):
+  # yields every question as an NDJSON line, in id order; yield_per streams
+  # the rows through a server-side cursor where the driver has one
+  rows = db.session.query(*question_columns).order_by(Question.id).yield_per(batch_size)
+  for id, question, answer, category, difficulty in rows:
+    yield dumps({
+      'id': id,
+      'question': question,
+      'answer': answer,
+      'category': category,
+      'difficulty': difficulty
+    }) + b'\n'
@@ -0,0 +1,52 @@
+import hashlib
+import json
+import threading
+from collections import namedtuple
+
+from .reloading import Reloading
+
+# The category map rarely changes, so it is loaded once and shared by every
+# endpoint, along with the /categories response body ready to send.
+
+Snapshot = namedtuple('Snapshot', ['version', 'categories', 'body', 'etag'])
+
+
+class CategoryRegistry:
+  '''
+  the {id: type} map of categories, loaded through load(), which returns
+  (id, type) pairs. invalidate() bumps the version after a category write and
+  the next read reloads; reads also reload once the map is ttl seconds old.
+  '''
+
+  def __init__(self, load, ttl=None):
+    self.load = load
+    self.lock = threading.Lock()
+    self.version = 0
+    self.snapshot = Reloading(self._load, ttl)
+
+  def _load(self):
+    categories = dict(self.load())
+    body = json.dumps({'success': True, 'categories': categories}, sort_keys=True).encode('utf-8')
+    # derived from the content rather than the version, which differs between
+    # workers and restarts; a client revalidating against any worker gets its
+    # 304 as long as the categories are the same
+    etag = hashlib.sha1(body).hexdigest()
+    return Snapshot(self.version, categories, body, etag)
+
+  def current(self):
+    with self.lock:
+      snapshot = self.snapshot.get()
+      # an empty map is not kept, in case the tables are filled in afterwards
+      if not snapshot.categories:
+        self.snapshot.clear()
+      return snapshot
+
+  @property
+  def categories(self):
+    return self.current().categories
+
+  def invalidate(self, *args):
+    # takes a listener's (event, category) arguments and ignores them
+    with self.lock:
+      self.version += 1
+      self.snapshot.clear()
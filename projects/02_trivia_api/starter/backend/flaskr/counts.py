@@ -0,0 +1,39 @@
+import threading
+
+from .reloading import Reloading
+
+# Row counts kept in memory, so responses can report a table's size without
+# running COUNT(*) on every request.
+
+
+class RowCounter:
+  '''
+  a row count loaded through count() on first use, then kept current by the
+  (event, instance) notifications of the table's listeners: +1 on insert,
+  -1 on delete, and a recount after a 'reload' or once ttl seconds have
+  passed since the last count.
+  '''
+
+  def __init__(self, count, ttl=None):
+    self.lock = threading.Lock()
+    self.total = Reloading(count, ttl)
+
+  def value(self):
+    with self.lock:
+      return self.total.get()
+
+  def on_event(self, event, instance):
+    with self.lock:
+      # nothing to adjust until the first count
+      if self.total.value is None:
+        return
+      if event == 'insert':
+        self.total.value += 1
+      elif event == 'delete':
+        self.total.value -= 1
+      elif event == 'reload':
+        self.total.clear()
+
+  def clear(self):
+    with self.lock:
+      self.total.clear()
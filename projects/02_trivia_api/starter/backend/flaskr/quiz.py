@@ -0,0 +1,220 @@
+import random
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from models import MIN_DIFFICULTY, MAX_DIFFICULTY
+from .reloading import Reloading
+
+# Random quiz question selection over in-memory id arrays, so picking the
+# next question never loads or formats the questions it does not return.
+
+# key of the bucket holding every question, for quizzes on all categories
+ALL_CATEGORIES = None
+
+# random draws tried before falling back to listing the eligible ids; each
+# draw misses with the excluded fraction of the bucket as its probability
+MAX_DRAWS = 32
+
+
+class Bucket:
+  # ids in an array for O(1) random access, with each id's position so it
+  # can be removed in O(1) by swapping the last id into its place
+
+  def __init__(self):
+    self.ids = []
+    self.positions = {}
+
+  def __len__(self):
+    return len(self.ids)
+
+  def add(self, id):
+    if id not in self.positions:
+      self.positions[id] = len(self.ids)
+      self.ids.append(id)
+
+  def discard(self, id):
+    index = self.positions.pop(id, None)
+    if index is None:
+      return
+    last = self.ids.pop()
+    if last != id:
+      self.ids[index] = last
+      self.positions[last] = index
+
+  def choice(self, exclude, rng):
+    ids = self.ids
+    if len(exclude) < len(ids):
+      for _ in range(MAX_DRAWS):
+        id = ids[rng.randrange(len(ids))]
+        if id not in exclude:
+          return id
+
+    # most of the bucket is excluded
+    eligible = [id for id in ids if id not in exclude]
+    return rng.choice(eligible) if eligible else None
+
+
+class QuestionPool:
+  '''
+  question ids bucketed by category and by (category, difficulty), loaded on
+  first use through load(), which returns (id, category, difficulty) rows.
+  add() and discard() keep the buckets in step between reloads, which come
+  every ttl seconds.
+  '''
+
+  def __init__(self, load, ttl=None, rng=random):
+    self.load = load
+    self.rng = rng
+    self.lock = threading.Lock()
+    self.index = Reloading(self._load, ttl)
+    self.buckets = None
+    self.keys = {}
+    self.difficulties = set()
+
+  def _load(self):
+    self.buckets = {ALL_CATEGORIES: Bucket()}
+    self.keys = {}
+    self.difficulties = set()
+    for id, category, difficulty in self.load():
+      self._add(id, category, difficulty)
+    return self.buckets
+
+  def _buckets(self):
+    return self.index.get()
+
+  def _add(self, id, category, difficulty):
+    self.keys[id] = (category, difficulty)
+    for key in (ALL_CATEGORIES, category, (ALL_CATEGORIES, difficulty), (category, difficulty)):
+      self.buckets.setdefault(key, Bucket()).add(id)
+    if difficulty is not None:
+      self.difficulties.add(difficulty)
+
+  def _discard(self, id):
+    category, difficulty = self.keys.pop(id, (None, None))
+    for key in (ALL_CATEGORIES, category, (ALL_CATEGORIES, difficulty), (category, difficulty)):
+      if key in self.buckets:
+        self.buckets[key].discard(id)
+
+  def _choice(self, key, exclude):
+    bucket = self.buckets.get(key)
+    return bucket.choice(exclude, self.rng) if bucket else None
+
+  def pick(self, category=ALL_CATEGORIES, exclude=(), difficulty=None):
+    '''
+    a random id in the category that is not in exclude (a set), or None.
+    Given a difficulty, the id is of that difficulty, or failing that of the
+    nearest one with questions left, the easier on a tie.
+    '''
+    with self.lock:
+      self._buckets()
+      if difficulty is None:
+        return self._choice(category, exclude)
+
+      for level in sorted(self.difficulties, key=lambda level: (abs(level - difficulty), level)):
+        id = self._choice((category, level), exclude)
+        if id is not None:
+          return id
+      return None
+
+  def add(self, id, category, difficulty=None):
+    with self.lock:
+      # an unloaded pool picks the question up when it loads
+      if self.index.value is not None:
+        self._discard(id)
+        self._add(id, category, difficulty)
+
+  def discard(self, id):
+    with self.lock:
+      if self.index.value is not None:
+        self._discard(id)
+
+  def clear(self):
+    with self.lock:
+      self.index.clear()
+
+
+# Quiz sessions keep the questions already asked on the server, so a client
+# sends only its session token on each turn.
+
+# correct answers in a row that take an adaptive session up a difficulty level
+LEVEL_UP_STREAK = 2
+
+class QuizSession:
+  '''
+  an adaptive session, started with a difficulty, moves up a difficulty
+  level after every LEVEL_UP_STREAK correct answers in a row and down one
+  after a wrong answer; other sessions ask questions of any difficulty
+  '''
+
+  def __init__(self, category=ALL_CATEGORIES, difficulty=None):
+    self.category = category
+    # a set rather than a bitset over ids: its size follows the length of the
+    # game, not the largest id in the bank
+    self.seen = set()
+    self.difficulty = difficulty
+    self.streak = 0
+
+  def record_answer(self, correct):
+    if correct:
+      self.streak += 1
+    else:
+      self.streak = 0
+    if self.difficulty is None:
+      return
+
+    if not correct:
+      self.difficulty = max(self.difficulty - 1, MIN_DIFFICULTY)
+    elif self.streak % LEVEL_UP_STREAK == 0:
+      self.difficulty = min(self.difficulty + 1, MAX_DIFFICULTY)
+
+
+class SessionStore:
+  '''
+  quiz sessions by token, in process memory. A session expires ttl seconds
+  after it was last used; past max_sessions the least recently used one is
+  evicted. Another store can be used instead if it has the same
+  create/get/save/delete methods.
+  '''
+
+  def __init__(self, ttl=3600, max_sessions=100000):
+    self.ttl = ttl
+    self.max_sessions = max_sessions
+    # token -> (expires, session), least recently used first
+    self.sessions = OrderedDict()
+    self.lock = threading.Lock()
+
+  def _evict(self, now):
+    while self.sessions:
+      token, (expires, session) = next(iter(self.sessions.items()))
+      if expires >= now and len(self.sessions) <= self.max_sessions:
+        return
+      del self.sessions[token]
+
+  def create(self, session):
+    token = secrets.token_urlsafe(16)
+    self.save(token, session)
+    return token
+
+  def get(self, token):
+    now = time.monotonic()
+    with self.lock:
+      self._evict(now)
+      entry = self.sessions.get(token)
+      if entry is None:
+        return None
+      self.sessions[token] = (now + self.ttl, entry[1])
+      self.sessions.move_to_end(token)
+      return entry[1]
+
+  def save(self, token, session):
+    now = time.monotonic()
+    with self.lock:
+      self.sessions[token] = (now + self.ttl, session)
+      self.sessions.move_to_end(token)
+      self._evict(now)
+
+  def delete(self, token):
+    with self.lock:
+      self.sessions.pop(token, None)
@@ -0,0 +1,37 @@
+import time
+
+# The quiz pool, category map and question count are copies of database
+# state held by each worker process. A worker updates its copy after its own
+# writes, but only a reload sees another worker's, so each copy is reloaded
+# once it is older than its ttl.
+#
+# The coffee shop backend has a copy of this class in src/reloading.py, as
+# the two projects run separately; keep them in step.
+
+
+class Reloading:
+  '''
+  the value of load(), loaded on first use, after clear(), and once it is
+  more than ttl seconds old (never, if ttl is None). It has no lock of its
+  own; the owner calls it under the lock that guards the value.
+  '''
+
+  def __init__(self, load, ttl=None):
+    self.load = load
+    self.ttl = ttl
+    self.value = None
+    self.loaded_at = 0
+
+  def fresh(self):
+    if self.value is None:
+      return False
+    return not self.ttl or time.monotonic() - self.loaded_at <= self.ttl
+
+  def get(self):
+    if not self.fresh():
+      self.value = self.load()
+      self.loaded_at = time.monotonic()
+    return self.value
+
+  def clear(self):
+    self.value = None
@@ -0,0 +1,154 @@
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from sqlalchemy import func, inspect, literal_column
+
+from models import Question
+
+# Question search. Every word of the search term must match a word of the
+# question or answer, or the start of one; matches in the question rank above
+# matches in the answer. PostgreSQL databases with the search_vector column
+# use its GIN index, anything else an inverted index kept in process memory.
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+QUESTION_WEIGHT = 2
+ANSWER_WEIGHT = 1
+
+
+def tokenize(text):
+  if not text:
+    return []
+  return TOKEN_RE.findall(text.lower())
+
+
+def has_search_vector(engine):
+  if engine.dialect.name != 'postgresql':
+    return False
+  return any(column['name'] == 'search_vector' for column in inspect(engine).get_columns('questions'))
+
+
+class PostgresSearch:
+
+  def search(self, term, category=None, offset=0, limit=None):
+    # returns one page of matching questions, best first, and the match count
+    words = tokenize(term)
+    if not words:
+      return [], 0
+
+    # only [a-z0-9] is left in words, so they are safe in a tsquery
+    query = func.to_tsquery('english', ' & '.join(word + ':*' for word in words))
+    vector = literal_column('questions.search_vector')
+
+    matches = Question.query.filter(vector.op('@@')(query))
+    if category is not None:
+      matches = matches.filter(Question.category == category)
+
+    page = matches.order_by(func.ts_rank(vector, query).desc(), Question.id).offset(offset).limit(limit).all()
+    return page, matches.count()
+
+
+class MemorySearch:
+  '''
+  inverted index of question and answer words, loaded on first use through
+  load(), which returns (id, category, question, answer) rows, and kept in
+  step through add() and discard()
+  '''
+
+  def __init__(self, load):
+    self.load = load
+    self.lock = threading.Lock()
+    self.postings = None
+    self.documents = {}
+    self.vocabulary = []
+    self.stale = True
+
+  def _index(self):
+    if self.postings is None:
+      self.postings = defaultdict(dict)
+      self.documents = {}
+      for id, category, question, answer in self.load():
+        self._add(id, category, question, answer)
+    if self.stale:
+      self.vocabulary = sorted(self.postings)
+      self.stale = False
+    return self.postings
+
+  def _add(self, id, category, question, answer):
+    scores = defaultdict(int)
+    for word in tokenize(question):
+      scores[word] += QUESTION_WEIGHT
+    for word in tokenize(answer):
+      scores[word] += ANSWER_WEIGHT
+
+    for word, score in scores.items():
+      self.postings[word][id] = score
+    self.documents[id] = (category, list(scores))
+    self.stale = True
+
+  def _discard(self, id):
+    category, words = self.documents.pop(id, (None, []))
+    for word in words:
+      self.postings[word].pop(id, None)
+      if not self.postings[word]:
+        del self.postings[word]
+        self.stale = True
+
+  def _scores(self, word):
+    # summed scores of the documents containing word or a word starting with it
+    scores = defaultdict(int)
+    start = bisect_left(self.vocabulary, word)
+    for candidate in self.vocabulary[start:]:
+      if not candidate.startswith(word):
+        break
+      for id, score in self.postings[candidate].items():
+        scores[id] += score
+    return scores
+
+  def search(self, term, category=None, offset=0, limit=None):
+    words = tokenize(term)
+    if not words:
+      return [], 0
+
+    with self.lock:
+      self._index()
+      matches = None
+      for word in set(words):
+        scores = self._scores(word)
+        if matches is None:
+          matches = scores
+        else:
+          matches = {id: score + scores[id] for id, score in matches.items() if id in scores}
+        if not matches:
+          return [], 0
+
+      if category is not None:
+        matches = {id: score for id, score in matches.items() if self.documents[id][0] == category}
+
+    ranked = sorted(matches, key=lambda id: (-matches[id], id))
+    ids = ranked[offset:None if limit is None else offset + limit]
+    if not ids:
+      return [], len(ranked)
+
+    questions = {question.id: question for question in Question.query.filter(Question.id.in_(ids))}
+    return [questions[id] for id in ids if id in questions], len(ranked)
+
+  def add(self, id, category, question, answer):
+    with self.lock:
+      # an unloaded index picks the question up when it loads
+      if self.postings is not None:
+        self._discard(id)
+        self._add(id, category, question, answer)
+
+  def discard(self, id):
+    with self.lock:
+      if self.postings is not None:
+        self._discard(id)
+
+  def clear(self):
+    with self.lock:
+      self.postings = None
+      self.documents = {}
+      self.stale = True
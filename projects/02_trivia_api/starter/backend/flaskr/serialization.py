@@ -0,0 +1,40 @@
+import json
+
+from flask import current_app
+
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+# JSON responses built from plain column rows and encoded with orjson when it
+# is installed, the standard library otherwise. The coffee shop API has a
+# copy of dumps, loads and json_response in src/serialization.py.
+
+
+def dumps(obj):
+  # bytes; dict keys may be ints, as in the category map
+  if orjson is not None:
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+  return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def loads(data):
+  if orjson is not None:
+    return orjson.loads(data)
+  return json.loads(data)
+
+
+def json_response(obj, status=200):
+  return current_app.response_class(dumps(obj), status=status, mimetype='application/json')
+
+
+def row_dicts(rows):
+  # dicts of rows selected as columns (Query.with_entities or a Core select),
+  # keyed by column name, without building ORM objects
+  rows = list(rows)
+  if not rows:
+    return []
+  keys = list(rows[0].keys())
+  return [dict(zip(keys, row)) for row in rows]
+
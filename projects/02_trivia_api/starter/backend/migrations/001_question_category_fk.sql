@@ -0,0 +1,40 @@
+--
+-- Makes questions.category an integer foreign key to categories.id, indexed
+-- on (category, id) so the questions of a category are an index range scan.
+--
+-- Databases restored from trivia.psql already have an integer column and
+-- the foreign key; databases created by an older models.py have a varchar
+-- column, whose values are converted here. Values that are not the id of a
+-- category become NULL. Safe to run more than once:
+--
+--     psql trivia < migrations/001_question_category_fk.sql
+--
+
+BEGIN;
+
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = 'questions' AND column_name = 'category') <> 'integer' THEN
+        UPDATE public.questions SET category = NULL
+        WHERE CASE WHEN category ~ '^\s*[0-9]{1,9}\s*$'
+                   THEN trim(category)::integer NOT IN (SELECT id FROM public.categories)
+                   ELSE true END;
+        ALTER TABLE public.questions
+            ALTER COLUMN category TYPE integer USING trim(category)::integer;
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'category' AND conrelid = 'public.questions'::regclass) THEN
+        UPDATE public.questions SET category = NULL
+        WHERE category NOT IN (SELECT id FROM public.categories);
+        ALTER TABLE ONLY public.questions
+            ADD CONSTRAINT category FOREIGN KEY (category) REFERENCES public.categories(id) ON UPDATE CASCADE ON DELETE SET NULL;
+    END IF;
+END
+$$;
+
+CREATE INDEX IF NOT EXISTS ix_questions_category_id ON public.questions USING btree (category, id);
+
+ANALYZE public.questions;
+
+COMMIT;
@@ -0,0 +1,37 @@
+--
+-- Adds questions.search_vector, a tsvector of the question (weighted A) and
+-- answer (weighted B) text, kept current by a trigger and indexed with GIN
+-- for full-text search. Existing rows are filled in. Safe to run more than
+-- once:
+--
+--     psql trivia < migrations/002_question_search_vector.sql
+--
+
+BEGIN;
+
+ALTER TABLE public.questions ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+CREATE OR REPLACE FUNCTION public.questions_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.question, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.answer, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS questions_search_vector_update ON public.questions;
+CREATE TRIGGER questions_search_vector_update
+    BEFORE INSERT OR UPDATE OF question, answer ON public.questions
+    FOR EACH ROW EXECUTE PROCEDURE public.questions_search_vector_update();
+
+UPDATE public.questions SET
+    search_vector =
+        setweight(to_tsvector('english', coalesce(question, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(answer, '')), 'B');
+
+CREATE INDEX IF NOT EXISTS ix_questions_search_vector ON public.questions USING gin (search_vector);
+
+ANALYZE public.questions;
+
+COMMIT;
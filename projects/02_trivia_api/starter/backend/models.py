@@ -1,5 +1,5 @@
 import os
-from sqlalchemy import Column, String, Integer, create_engine
+from sqlalchemy import Column, String, Integer, ForeignKey, Index, DDL, event, create_engine
 from flask_sqlalchemy import SQLAlchemy
 import json
 
@@ -11,6 +11,10 @@ database_path = "postgres://{}:{}@{}/{}".format(DB_USER,DB_PASSWORD,DB_HOST, DB_
 
 db = SQLAlchemy()
 
+# the range of Question.difficulty
+MIN_DIFFICULTY = 1
+MAX_DIFFICULTY = 5
+
 '''
 setup_db(app)
     binds a flask application and a SQLAlchemy service
@@ -22,17 +26,32 @@ def setup_db(app, database_path=database_path):
     db.init_app(app)
     db.create_all()
 
+'''
+question_listeners, category_listeners
+    callables notified with (event, instance) after a question or category is
+    inserted, updated or deleted, e.g. to keep in-memory indexes in step with
+    the tables. Bulk writes notify ('reload', None) instead.
+'''
+question_listeners = []
+category_listeners = []
+
+def notify(listeners, event, instance):
+    for listener in listeners:
+        listener(event, instance)
+
 '''
 Question
 
 '''
 class Question(db.Model):
   __tablename__ = 'questions'
+  # questions of a category, in id order, are an index range scan
+  __table_args__ = (Index('ix_questions_category_id', 'category', 'id'),)
 
   id = Column(Integer, primary_key=True)
   question = Column(String)
   answer = Column(String)
-  category = Column(String)
+  category = Column(Integer, ForeignKey('categories.id', name='category', onupdate='CASCADE', ondelete='SET NULL'))
   difficulty = Column(Integer)
 
   def __init__(self, question, answer, category, difficulty):
@@ -44,13 +63,18 @@ class Question(db.Model):
   def insert(self):
     db.session.add(self)
     db.session.commit()
+    notify(question_listeners, 'insert', self)
 
   def update(self):
     db.session.commit()
+    notify(question_listeners, 'update', self)
 
   def delete(self):
+    # loaded before the commit, so listeners can still read them
+    self.id, self.category
     db.session.delete(self)
     db.session.commit()
+    notify(question_listeners, 'delete', self)
 
   def format(self):
     return {
@@ -61,6 +85,41 @@ class Question(db.Model):
       'difficulty': self.difficulty
     }
 
+'''
+question_columns
+    the columns of Question.format(), for selecting questions as plain rows
+    without building Question objects
+'''
+question_columns = (Question.id, Question.question, Question.answer, Question.category, Question.difficulty)
+
+'''
+question_search_ddl
+    on PostgreSQL, a tsvector of each question's question (weighted A) and
+    answer (weighted B) text, kept current by a trigger and indexed with GIN.
+    It is not mapped, so it is never loaded with a Question.
+    migrations/002_question_search_vector.sql adds it to existing databases.
+'''
+question_search_ddl = DDL('''
+ALTER TABLE questions ADD COLUMN search_vector tsvector;
+
+CREATE OR REPLACE FUNCTION questions_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.question, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.answer, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER questions_search_vector_update
+    BEFORE INSERT OR UPDATE OF question, answer ON questions
+    FOR EACH ROW EXECUTE PROCEDURE questions_search_vector_update();
+
+CREATE INDEX ix_questions_search_vector ON questions USING gin (search_vector);
+''')
+
+event.listen(Question.__table__, 'after_create', question_search_ddl.execute_if(dialect='postgresql'))
+
 '''
 Category
 
@@ -74,6 +133,20 @@ class Category(db.Model):
   def __init__(self, type):
     self.type = type
 
+  def insert(self):
+    db.session.add(self)
+    db.session.commit()
+    notify(category_listeners, 'insert', self)
+
+  def update(self):
+    db.session.commit()
+    notify(category_listeners, 'update', self)
+
+  def delete(self):
+    db.session.delete(self)
+    db.session.commit()
+    notify(category_listeners, 'delete', self)
+
   def format(self):
     return {
       'id': self.id,
@@ -73,6 +73,14 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(data['success'], True)
 
+    def test_categories_not_modified(self):
+        res = self.client().get('/categories')
+        etag = res.headers['ETag']
+
+        res = self.client().get('/categories', headers={'If-None-Match': etag})
+
+        self.assertEqual(res.status_code, 304)
+
     def test_questions(self):
         res = self.client().get('/questions')
         data = json.loads(res.data)
@@ -80,6 +88,22 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(data['success'], True)
 
+    def test_questions_paginated(self):
+        res = self.client().get('/questions?page=1')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(len(data['questions']) <= 10)
+        self.assertTrue(data['total_questions'] >= len(data['questions']))
+
+    def test_questions_beyond_last_page(self):
+        res = self.client().get('/questions?page=1000')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(data['success'], False)
+        self.assertEqual(data['message'], 'resource not found')
+
     # def test_delete(self):
     #     res = self.client().delete('/questions/6')
     #     data = json.loads(res.data)
@@ -102,6 +126,32 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], True)
         self.assertTrue(data['question_id'])
 
+    def test_bulk_import(self):
+        lines = [json.dumps(self.add_question), '{"question": "No answer"}']
+        res = self.client().post('/questions/bulk', data='\n'.join(lines), content_type='application/x-ndjson')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['inserted'], 1)
+        self.assertEqual(data['rejected'], 1)
+        self.assertEqual(data['errors'][0]['line'], 2)
+
+    def test_export(self):
+        res = self.client().get('/questions/export')
+        questions = [json.loads(line) for line in res.data.splitlines()]
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(all('answer' in question for question in questions))
+
+    def test_add_new_question_minimal(self):
+        res = self.client().post('/questions?response=minimal', json=self.add_question)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(data['question_id'])
+        self.assertTrue(data['total_questions'])
+        self.assertNotIn('questions', data)
+
     def test_search(self):
         res = self.client().post('/questions/search', json=self.searchItemFind)
         data = json.loads(res.data)
@@ -109,6 +159,17 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(data['success'], True)
 
+    def test_search_in_category(self):
+        # 'artist' is in two Art questions (category 2) of trivia.psql
+        res = self.client().post('/questions/search', json={'searchTerm': 'artist', 'category': 2})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['current_category'], 2)
+        self.assertTrue(data['total_questions'] > 0)
+        self.assertTrue(len(data['questions']) > 0)
+        self.assertTrue(all(question['category'] == 2 for question in data['questions']))
+
     def test_search_not_present(self):
         res = self.client().post('/questions/search', json=self.searchItemNotFind)
         data = json.loads(res.data)
@@ -136,6 +197,36 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(data['success'], False)
 
+    def test_quiz_session(self):
+        res = self.client().post('/quizzes/sessions', json={'quiz_category': self.quizInfo['quiz_category']})
+        token = json.loads(res.data)['session']
+
+        res = self.client().post('/quizzes', json={'session': token})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+
+    def test_quiz_adaptive_session(self):
+        res = self.client().post('/quizzes/sessions', json={'adaptive': True, 'difficulty': 2})
+        token = json.loads(res.data)['session']
+
+        self.client().post('/quizzes', json={'session': token})
+        self.client().post('/quizzes', json={'session': token, 'correct': True})
+        res = self.client().post('/quizzes', json={'session': token, 'correct': True})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['streak'], 2)
+        self.assertEqual(data['difficulty'], 3)
+
+    def test_quiz_unknown_session(self):
+        res = self.client().post('/quizzes', json={'session': 'XYZ99'})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(data['message'], 'resource not found')
+
     """
     TODO
     Write at least one test for each test for successful operation and for expected errors.
@@ -0,0 +1,84 @@
+'''
+Cost of building the GET /drinks response at 1k, 10k and 100k drinks.
+
+    python benchmarks/bench_drinks.py [--rows N ...] [--repeat N]
+
+"before" is what get_drinks used to do: load every drink with its recipe as
+JSON text, parse it, project the short recipe and jsonify the result (short()
+without its debug print). "after" is drink_list_json('short'), which copies
+the precomputed recipe_short column into the response without parsing it.
+Runs against an in-memory SQLite database.
+'''
+import argparse
+import json
+import os
+import sys
+import timeit
+
+from flask import Flask, jsonify
+from sqlalchemy import Text, type_coerce
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.database import models
+from src.database.models import setup_db, db, Drink, drink_list_json, short_recipe
+from src.serialization import dumps_with, json_response, orjson
+
+
+def short_before(id, title, recipe):
+    short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in json.loads(recipe)]
+    return {
+        'id': id,
+        'title': title,
+        'recipe': short_recipe
+    }
+
+
+def respond_before():
+    rows = db.session.query(Drink.id, Drink.title, type_coerce(Drink.recipe, Text)).all()
+    drinks = [short_before(*row) for row in rows]
+    response = jsonify({'success': True, 'drinks': drinks})
+    # as at the end of a request, so every run builds its Drink objects anew
+    db.session.expunge_all()
+    return response
+
+
+def respond_after():
+    response = json_response(dumps_with({'success': True}, drinks=drink_list_json('short')))
+    db.session.expunge_all()
+    return response
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    models.database_path = 'sqlite://'
+    app = Flask(__name__)
+    setup_db(app)
+
+    print('encoder: %s, best of %d' % ('orjson' if orjson else 'json', args.repeat))
+    with app.test_request_context():
+        db.create_all()
+        loaded = 0
+        for rows in sorted(args.rows):
+            recipe = [
+                {'name': 'espresso', 'color': 'brown', 'parts': 1},
+                {'name': 'milk', 'color': 'white', 'parts': 3},
+            ]
+            db.session.execute(Drink.__table__.insert(), [{
+                'title': 'Drink %d' % i,
+                'recipe': recipe,
+                'recipe_short': short_recipe(recipe),
+            } for i in range(loaded, rows)])
+            db.session.commit()
+            loaded = rows
+
+            before = min(timeit.repeat(respond_before, number=1, repeat=args.repeat))
+            after = min(timeit.repeat(respond_after, number=1, repeat=args.repeat))
+            print('%7d rows   before %8.1f ms   after %8.1f ms   %.1fx' % (rows, before * 1000, after * 1000, before / after))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,13 @@
 import os
-from flask import Flask, request, jsonify, abort
+from flask import Flask, request, abort
 from sqlalchemy import exc
 import json
 from flask_cors import CORS
 
-from .database.models import db_drop_and_create_all, setup_db, Drink
-from .auth.auth import AuthError, requires_auth
+from .database.models import db_drop_and_create_all, migrate_recipe_columns, setup_db, Drink, drink_list_json, menu_version
+from .auth.auth import AuthError, requires_auth, verified_tokens
+from .serialization import dumps_with, json_response
+from .menu import MenuCache
 
 app = Flask(__name__)
 setup_db(app)
@@ -13,6 +15,41 @@ CORS(app)
 
 # db_drop_and_create_all()
 
+
+# `flask migrate-recipes` brings a database.db made before recipes were JSON
+# columns up to date.
+
+@app.cli.command('migrate-recipes')
+def migrate_recipes():
+  bad_ids = migrate_recipe_columns()
+  print('recipes migrated; drinks with a bad recipe: {}'.format(bad_ids or 'none'))
+
+# The menu bodies are built once per menu version, which every Drink write
+# bumps, and at least every MENU_TTL seconds.
+
+MENU_TTL = 5
+
+
+def build_menu(form):
+  drinks = drink_list_json(form)
+  return dumps_with({'success': True}, drinks=drinks), drinks == b'[]'
+
+
+menu = MenuCache(build_menu, menu_version, ttl=MENU_TTL)
+
+
+def menu_response(form):
+  # a tablet polling with the etag it already holds gets an empty 304 until
+  # a drink changes
+  snapshot = menu.current(form)
+
+  if snapshot.empty:
+    abort(404)
+
+  response = app.response_class(snapshot.body, mimetype='application/json')
+  response.set_etag(snapshot.etag)
+  return response.make_conditional(request)
+
 # ROUTES
 
 # Get drinks endpoint
@@ -20,19 +57,7 @@ CORS(app)
 @app.route('/drinks', methods=['GET'])
 def get_drinks():
   try:
-    drinks = Drink.query.all()
-
-    get_drinklist = []
-    for dk in drinks:
-        get_drinklist.append(dk.short())
-
-    if len(get_drinklist) == 0:
-      abort(404)
-
-    return jsonify ({
-        'success': True,
-        'drinks' : get_drinklist
-    })
+    return menu_response('short')
   except Exception as e:
     print(e)
     abort(422)
@@ -43,19 +68,7 @@ def get_drinks():
 @requires_auth('get:drinks-detail')
 def get_drinks_details(jwt):
       try:
-        drinks = Drink.query.order_by(Drink.id).all()
-        get_drinklist = [drink.long() for drink in drinks]
-        # get_drinklist = []
-        # for dk in drinks:
-        #     get_drinklist.append(dk.long())
-
-        if len(get_drinklist) == 0:
-          abort(404)
-
-        return jsonify ({
-            'success': True,
-            'drinks' : get_drinklist
-        })
+        return menu_response('long')
       except Exception as e:
         print(e)
         abort(422)
@@ -74,10 +87,10 @@ def get_drinks_new(jwt):
         abort(422)
     else:
       try:
-        drink = Drink(title=req_title, recipe=json.dumps(req_recipe))
+        drink = Drink(title=req_title, recipe=req_recipe)
         drink.insert()
 
-        return jsonify ({
+        return json_response({
             'success': True,
             'drinks' : drink.long()
         }),200
@@ -98,7 +111,7 @@ def get_drinks_edit(jwt, drink_id):
 
     drink = Drink.query.filter(Drink.id == drink_id).one_or_none()
 
-    if drink == 0:
+    if drink is None:
         abort(404)
     else:
       try:
@@ -108,7 +121,7 @@ def get_drinks_edit(jwt, drink_id):
             drink.recipe = req_recipe
         drink.update()
 
-        return jsonify ({
+        return json_response({
             'success': True,
             'drinks' : [drink.long()]
         })
@@ -125,13 +138,13 @@ def drinks_delete(jwt, drink_id):
 
     drink = Drink.query.filter(Drink.id == drink_id).one_or_none()
 
-    if drink == 0:
+    if drink is None:
         abort(404)
     else:
       try:
         drink.delete()
 
-        return jsonify ({
+        return json_response({
             'success': True,
             'deleted' : drink_id
         })
@@ -140,11 +153,20 @@ def drinks_delete(jwt, drink_id):
         print(e)
         abort(422)
 
+# Health endpoint, with the hit and miss counts of the verified token cache
+
+@app.route('/health', methods=['GET'])
+def health():
+  return json_response({
+    'success': True,
+    'verified_tokens': verified_tokens.stats()
+  })
+
 # Error handling for unprocessable and resource not found
 
 @app.errorhandler(422)
 def unprocessable(error):
-    return jsonify({
+    return json_response({
         "success": False,
         "error": 422,
         "message": "unprocessable"
@@ -152,7 +174,7 @@ def unprocessable(error):
 
 @app.errorhandler(404)
 def unprocessable(error):
-    return jsonify({
+    return json_response({
         "success": False,
         "error": 404,
         "message": "resource not found"
@@ -162,6 +184,4 @@ def unprocessable(error):
 
 @app.errorhandler(AuthError)
 def error_authError(error):
-    response = jsonify(error.error)
-    response.status_code = error.status_code
-    return response
+    return json_response(error.error, error.status_code)
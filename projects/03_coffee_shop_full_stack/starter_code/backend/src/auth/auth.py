@@ -1,13 +1,24 @@
-import json
+import os
 from flask import request, _request_ctx_stack
 from functools import wraps
 from jose import jwt
-from urllib.request import urlopen
+
+from .jwks import JWKSKeyStore, source_from
+from .permissions import Requirement, granted_permissions
+from .token_cache import VerifiedTokenCache
 
 
 AUTH0_DOMAIN = 'karlg.au.auth0.com'
 ALGORITHMS = ['RS256']
 API_AUDIENCE = 'coffees'
+# a URL or a local file, e.g. a stand-in key set for tests
+JWKS_LOCATION = os.getenv('JWKS_LOCATION', f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
+
+# signing keys, fetched once and refreshed in the background
+jwks = JWKSKeyStore(source_from(JWKS_LOCATION))
+
+# payloads and permission sets of tokens already verified, until they expire
+verified_tokens = VerifiedTokenCache()
 
 ## AuthError Exception
 '''
@@ -55,15 +66,21 @@ def get_token_auth_header():
     return token
 
 # check permissions
+# permission is a permission name or a compiled Requirement; granted is the
+# payload's permission set, when the caller already has it
 
-def check_permissions(permission, payload):
-    if 'permissions' not in payload:
+def check_permissions(permission, payload, granted=None):
+    if granted is None:
+        granted = granted_permissions(payload)
+    if granted is None:
                         raise AuthError({
                             'code': 'invalid_claims',
                             'description': 'Permissions not included in JWT.'
                         }, 400)
 
-    if permission not in payload['permissions']:
+    if not isinstance(permission, Requirement):
+        permission = Requirement(all_of=[permission])
+    if not permission.allows(granted):
         raise AuthError({
             'code': 'unauthorized',
             'description': 'Permission not found.'
@@ -73,8 +90,6 @@ def check_permissions(permission, payload):
 # verify and decode jwt
 
 def verify_decode_jwt(token):
-    jsonurl = urlopen(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
-    jwks = json.loads(jsonurl.read())
     unverified_header = jwt.get_unverified_header(token)
     rsa_key = {}
     if 'kid' not in unverified_header:
@@ -83,15 +98,15 @@ def verify_decode_jwt(token):
             'description': 'Authorization malformed.'
         }, 401)
 
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
+    key = jwks.get(unverified_header['kid'])
+    if key:
+        rsa_key = {
+            'kty': key['kty'],
+            'kid': key['kid'],
+            'use': key['use'],
+            'n': key['n'],
+            'e': key['e']
+        }
     if rsa_key:
         try:
             payload = jwt.decode(
@@ -125,15 +140,36 @@ def verify_decode_jwt(token):
                 'description': 'Unable to find the appropriate key.'
             }, 403)
 
+# payload and permission set of a token, verified on first sight and then
+# taken from the cache
+
+def verified_token(token):
+    entry = verified_tokens.get(token)
+    if entry is None:
+        payload = verify_decode_jwt(token)
+        entry = verified_tokens.set(token, payload, granted_permissions(payload))
+    return entry
+
 # requires_auth to check for requested permissions
+# permission, or every permission of all_of, and one of any_of when given,
+# e.g. @requires_auth(any_of=['patch:drinks', 'post:drinks']). A route must
+# require at least one permission; one decorated with none raises at import.
+
+def requires_auth(permission='', any_of=(), all_of=()):
+    if isinstance(all_of, str):
+        all_of = [all_of]
+    if isinstance(any_of, str):
+        any_of = [any_of]
+    if not any([permission, *all_of, *any_of]):
+        raise ValueError('requires_auth needs at least one permission')
+    requirement = Requirement(all_of=[permission, *all_of], any_of=any_of)
 
-def requires_auth(permission=''):
     def requires_auth_decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
             token = get_token_auth_header()
-            payload = verify_decode_jwt(token)
-            check_permissions(permission, payload)
+            payload, granted = verified_token(token)
+            check_permissions(requirement, payload, granted)
             return f(payload, *args, **kwargs)
 
         return wrapper
@@ -0,0 +1,76 @@
+from itertools import product
+
+'''
+Permission sets
+A token's permissions claim is turned into a frozenset once, when the token is
+verified, and what a route requires is compiled when it is decorated, so a
+check is a few set lookups however many permissions the token carries.
+
+Permissions are segments joined by ':', e.g. get:drinks-detail. A token
+permission with * for a segment grants every value of that segment:
+get:* grants get:drinks and get:drinks-detail, *:drinks grants every action
+on drinks, and * on its own grants everything.
+'''
+
+SEPARATOR = ':'
+WILDCARD = '*'
+
+
+'''
+granted_permissions(payload)
+    the frozenset of a payload's permissions, or None when the payload has
+    no permissions claim
+'''
+
+
+def granted_permissions(payload):
+    permissions = payload.get('permissions')
+    if not isinstance(permissions, (list, tuple)):
+        return None
+    return frozenset(p for p in permissions if isinstance(p, str))
+
+
+'''
+grants_for(permission)
+    every token permission that grants permission: the permission itself,
+    each form of it with some segments replaced by *, and *
+    EXAMPLE
+        grants_for('get:drinks') == {'get:drinks', 'get:*', '*:drinks', '*:*', '*'}
+'''
+
+
+def grants_for(permission):
+    segments = permission.split(SEPARATOR)
+    grants = {WILDCARD}
+    for wild in product((False, True), repeat=len(segments)):
+        grants.add(SEPARATOR.join(
+            WILDCARD if w else segment for segment, w in zip(segments, wild)))
+    return frozenset(grants)
+
+
+'''
+Requirement
+    what a route requires, compiled from permission names: every permission
+    of all_of, and at least one of any_of when any_of is given. allows()
+    takes a token's granted_permissions.
+    EXAMPLE
+        requirement = Requirement(any_of=['patch:drinks', 'post:drinks'])
+        requirement.allows(frozenset(['post:drinks'])) == True
+'''
+
+
+class Requirement:
+    def __init__(self, all_of=(), any_of=()):
+        if isinstance(all_of, str):
+            all_of = [all_of]
+        if isinstance(any_of, str):
+            any_of = [any_of]
+        self.all_of = tuple(grants_for(p) for p in all_of if p)
+        any_of = [p for p in any_of if p]
+        self.any_of = frozenset().union(*map(grants_for, any_of)) if any_of else None
+
+    def allows(self, granted):
+        # isdisjoint walks the smaller set, so this does not grow with granted
+        if self.any_of is not None and granted.isdisjoint(self.any_of):
+            return False
+        return all(not granted.isdisjoint(grants) for grants in self.all_of)
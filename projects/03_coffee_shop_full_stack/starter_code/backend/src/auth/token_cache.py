@@ -0,0 +1,76 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+'''
+Verified token cache
+Remembers the payloads of tokens that passed signature verification, with
+their permission sets, so a token presented again skips the RSA check until
+it expires.
+'''
+
+DEFAULT_MAX_ENTRIES = 10000
+
+
+'''
+VerifiedTokenCache
+    (payload, permissions) of verified tokens, keyed by the token's sha256
+    digest (the token itself is never stored) and dropped at the payload's
+    exp. Past max_entries the least recently used entry is evicted. hits and
+    misses count the lookups; stats() reports them, at GET /health.
+    EXAMPLE
+        entry = verified_tokens.get(token)
+        if entry is None:
+            payload = verify_decode_jwt(token)
+            entry = verified_tokens.set(token, payload, granted_permissions(payload))
+'''
+
+
+class VerifiedTokenCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(token):
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token):
+        key = self.key(token)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] <= time.time():
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1:]
+
+    def set(self, token, payload, permissions=None):
+        # returns the (payload, permissions) entry, cached or not
+        expires = payload.get('exp')
+        # a token without an expiry is verified every time
+        if not isinstance(expires, (int, float)) or expires <= time.time():
+            return payload, permissions
+        key = self.key(token)
+        with self.lock:
+            self.entries[key] = (expires, payload, permissions)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return payload, permissions
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries)}
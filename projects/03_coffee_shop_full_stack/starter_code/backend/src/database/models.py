@@ -1,14 +1,24 @@
 import os
-from sqlalchemy import Column, String, Integer
+import logging
+from sqlalchemy import Column, String, Integer, JSON, Text, inspect, select, type_coerce
+from sqlalchemy.orm import validates
 from flask_sqlalchemy import SQLAlchemy
 import json
 
+from ..menu import MenuVersion
+from ..serialization import dumps_with
+
 database_filename = "database.db"
 project_dir = os.path.dirname(os.path.abspath(__file__))
 database_path = "sqlite:///{}".format(os.path.join(project_dir, database_filename))
 
 db = SQLAlchemy()
 
+logger = logging.getLogger(__name__)
+
+# bumped by every Drink insert, update and delete
+menu_version = MenuVersion()
+
 '''
 setup_db(app)
     binds a flask application and a SQLAlchemy service
@@ -36,13 +46,63 @@ def db_drop_and_create_all():
     # add one demo row which is helping in POSTMAN test
     drink = Drink(
         title='water',
-        recipe='[{"name": "water", "color": "blue", "parts": 1}]'
+        recipe=[{"name": "water", "color": "blue", "parts": 1}]
     )
 
 
     drink.insert()
+'''
+migrate_recipe_columns()
+    brings a database made before recipes were JSON columns up to date:
+    adds the recipe_short column and fills it in from each drink's recipe.
+    Does nothing on an up to date database or one without the drink table
+    yet. Run it once with `flask migrate-recipes`.
+    A recipe that is not valid JSON, or an ingredient without color or
+    parts, is logged and gets an empty recipe_short so the rest still
+    migrate. Returns the ids of those drinks.
+    SQLite does not enforce the old VARCHAR(180) length, so the recipe column
+    itself is left as it is.
+    EXAMPLE
+        with app.app_context():
+            bad_ids = migrate_recipe_columns()
+'''
+
+
+def migrate_recipe_columns():
+    inspector = inspect(db.engine)
+    if 'drink' not in inspector.get_table_names():
+        return []
+    columns = [column['name'] for column in inspector.get_columns('drink')]
+    if 'recipe_short' in columns:
+        return []
+    bad_ids = []
+    with db.engine.begin() as connection:
+        connection.execute('ALTER TABLE drink ADD COLUMN recipe_short JSON')
+        for id, recipe in connection.execute('SELECT id, recipe FROM drink').fetchall():
+            try:
+                recipe_short = short_recipe(json.loads(recipe))
+            except (TypeError, ValueError, KeyError) as e:
+                logger.warning('drink %s has a bad recipe (%r), left without a short recipe: %s', id, e, recipe)
+                bad_ids.append(id)
+                recipe_short = []
+            connection.execute(
+                Drink.__table__.update().where(Drink.id == id),
+                recipe_short=recipe_short)
+    return bad_ids
+
+
 # ROUTES
 
+'''
+short_recipe(recipe)
+    the short form of a recipe: the color and parts of each ingredient
+'''
+
+
+def short_recipe(recipe):
+    return [{'color': r['color'], 'parts': r['parts']} for r in recipe]
+
+
 '''
 Drink
 a persistent drink entity, extends the base SQLAlchemy Model
@@ -54,9 +114,17 @@ class Drink(db.Model):
     id = Column(Integer().with_variant(Integer, "sqlite"), primary_key=True)
     # String Title
     title = Column(String(80), unique=True)
-    # the ingredients blob - this stores a lazy json blob
+    # the ingredients, parsed once when the row is loaded
     # the required datatype is [{'color': string, 'name':string, 'parts':number}]
-    recipe = Column(String(180), nullable=False)
+    recipe = Column(JSON, nullable=False)
+    # short_recipe(recipe), kept up to date whenever recipe is assigned
+    recipe_short = Column(JSON, nullable=False)
+
+    @validates('recipe')
+    def validate_recipe(self, key, recipe):
+        # a recipe without color or parts raises here, before it is stored
+        self.recipe_short = short_recipe(recipe)
+        return recipe
 
     '''
     short()
@@ -64,12 +132,10 @@ class Drink(db.Model):
     '''
 
     def short(self):
-        print(json.loads(self.recipe))
-        short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in json.loads(self.recipe)]
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': short_recipe
+            'recipe': self.recipe_short
         }
 
     '''
@@ -81,7 +147,7 @@ class Drink(db.Model):
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': json.loads(self.recipe)
+            'recipe': self.recipe
         }
 
     '''
@@ -97,6 +163,7 @@ class Drink(db.Model):
     def insert(self):
         db.session.add(self)
         db.session.commit()
+        menu_version.bump()
 
     '''
     delete()
@@ -110,6 +177,7 @@ class Drink(db.Model):
     def delete(self):
         db.session.delete(self)
         db.session.commit()
+        menu_version.bump()
 
     '''
     update()
@@ -123,6 +191,26 @@ class Drink(db.Model):
 
     def update(self):
         db.session.commit()
+        menu_version.bump()
 
     def __repr__(self):
         return json.dumps(self.short())
+
+
+'''
+drink_list_json(form)
+    the short() or long() form of every drink, in id order, as an encoded
+    JSON array. The recipe or recipe_short column is read as JSON text and
+    copied into the output as is, so no recipe is parsed.
+    EXAMPLE
+        body = dumps_with({'success': True}, drinks=drink_list_json('short'))
+'''
+
+
+def drink_list_json(form):
+    recipe = Drink.recipe_short if form == 'short' else Drink.recipe
+    rows = db.session.execute(
+        select([Drink.id, Drink.title, type_coerce(recipe, Text)]).order_by(Drink.id))
+    return b'[' + b','.join(
+        dumps_with({'id': id, 'title': title}, recipe=recipe.encode('utf-8'))
+        for id, title, recipe in rows) + b']'
@@ -0,0 +1,82 @@
+import hashlib
+import threading
+from collections import namedtuple
+from functools import partial
+
+from .reloading import Reloading
+
+'''
+Menu cache
+The storefront polls the menu every few seconds, so the GET /drinks and
+GET /drinks-detail bodies are built once per menu version and sent as they
+are, with an etag that lets an unchanged menu be answered with a 304.
+'''
+
+Snapshot = namedtuple('Snapshot', ['version', 'empty', 'body', 'etag'])
+
+
+'''
+MenuVersion
+    a number that only goes up; Drink.insert(), update() and delete() bump
+    it, so menus built at an older version are known to be stale
+'''
+
+
+class MenuVersion:
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def bump(self):
+        with self.lock:
+            self.value += 1
+
+
+'''
+MenuCache
+    response bodies by form ('short' or 'long'), built through build(form),
+    which returns the encoded body and whether the menu is empty. A body is
+    rebuilt once version has moved on, and when its ttl runs out.
+    EXAMPLE
+        menu = MenuCache(build_menu, menu_version, ttl=5)
+        snapshot = menu.current('short')
+'''
+
+
+class MenuCache:
+    def __init__(self, build, version, ttl=None):
+        self.build = build
+        self.version = version
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.bodies = {}
+
+    def current(self, form):
+        # the common case, an unchanged menu, takes no lock
+        body = self.bodies.get(form)
+        if body is not None and body.fresh():
+            snapshot = body.value
+            if snapshot is not None and snapshot.version == self.version.value:
+                return snapshot
+
+        with self.lock:
+            body = self.bodies.get(form)
+            if body is None:
+                body = self.bodies[form] = Reloading(partial(self._build, form), self.ttl)
+            elif body.value is not None and body.value.version != self.version.value:
+                body.clear()
+            return body.get()
+
+    def _build(self, form):
+        # read before building: a write landing during the build leaves the
+        # snapshot at the older version, and the next read rebuilds
+        version = self.version.value
+        body, empty = self.build(form)
+        # tablets keep the etag across rebuilds that change nothing, such as
+        # ttl reloads, and get their 304 from any server process
+        etag = hashlib.sha1(body).hexdigest()
+        return Snapshot(version, empty, body, etag)
+
+    def clear(self):
+        with self.lock:
+            self.bodies = {}
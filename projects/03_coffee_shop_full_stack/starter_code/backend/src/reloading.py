@@ -0,0 +1,37 @@
+import time
+
+'''
+Reloading
+    the value of load(), loaded on first use, after clear(), and once it is
+    more than ttl seconds old (never, if ttl is None). The menu cache uses
+    it for its bodies: Drink writes in this process bump the menu version,
+    but a write made by another server process only shows up on a reload.
+    There is no lock here; the owner holds its own around get().
+    This is a deliberate copy of the trivia API's flaskr/reloading.py, as
+    the two projects run separately; keep them in step.
+    EXAMPLE
+        menu_body = Reloading(lambda: build_menu('short'), ttl=5)
+        body = menu_body.get()
+'''
+
+
+class Reloading:
+    def __init__(self, load, ttl=None):
+        self.load = load
+        self.ttl = ttl
+        self.value = None
+        self.loaded_at = 0
+
+    def fresh(self):
+        if self.value is None:
+            return False
+        return not self.ttl or time.monotonic() - self.loaded_at <= self.ttl
+
+    def get(self):
+        if not self.fresh():
+            self.value = self.load()
+            self.loaded_at = time.monotonic()
+        return self.value
+
+    def clear(self):
+        self.value = None
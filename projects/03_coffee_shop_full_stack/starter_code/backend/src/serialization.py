@@ -0,0 +1,43 @@
+import json
+
+from flask import current_app
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# JSON responses encoded with orjson when it is installed, the standard
+# library otherwise. The trivia API has a copy of dumps, loads and
+# json_response in flaskr/serialization.py.
+
+
+def dumps(obj):
+    # bytes; dict keys may be ints
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_with(obj, **encoded):
+    # dumps(obj) with more keys whose values are already encoded JSON bytes,
+    # e.g. JSON text read from the database as is
+    body = dumps(obj)[:-1]
+    for key, value in encoded.items():
+        if len(body) > 1:
+            body += b','
+        body += dumps(key) + b':' + value
+    return body + b'}'
+
+
+def json_response(obj, status=200):
+    # obj may be already encoded bytes
+    body = obj if isinstance(obj, bytes) else dumps(obj)
+    return current_app.response_class(body, status=status, mimetype='application/json')
+
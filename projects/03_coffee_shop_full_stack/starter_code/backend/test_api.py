@@ -0,0 +1,55 @@
+import json
+import time
+import unittest
+from unittest.mock import patch
+
+from src.api import app
+from src.auth import auth
+from src.auth.auth import requires_auth, verified_token, verified_tokens
+
+
+class RequiresAuthTestCase(unittest.TestCase):
+    """This class represents the requires_auth decorator test case"""
+
+    def test_requires_a_permission(self):
+        for kwargs in ({}, {'permission': ''}, {'all_of': []}, {'any_of': ['']}):
+            with self.assertRaises(ValueError):
+                requires_auth(**kwargs)
+
+    def test_accepts_any_of(self):
+        self.assertTrue(callable(requires_auth(any_of=['patch:drinks', 'post:drinks'])))
+
+
+class VerifiedTokenCacheTestCase(unittest.TestCase):
+    """This class represents the verified token cache test case"""
+
+    def setUp(self):
+        self.client = app.test_client
+        verified_tokens.clear()
+        verified_tokens.hits = verified_tokens.misses = 0
+        self.payload = {'exp': time.time() + 3600, 'permissions': ['get:drinks-detail']}
+
+    def test_counters(self):
+        with patch.object(auth, 'verify_decode_jwt', return_value=self.payload) as verify:
+            verified_token('token')
+            verified_token('token')
+            verified_token('token')
+
+        self.assertEqual(verify.call_count, 1)
+        self.assertEqual(verified_tokens.stats(), {'hits': 2, 'misses': 1, 'size': 1})
+
+    def test_health(self):
+        with patch.object(auth, 'verify_decode_jwt', return_value=self.payload):
+            verified_token('token')
+            verified_token('token')
+
+        res = self.client().get('/health')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['verified_tokens'], {'hits': 1, 'misses': 1, 'size': 1})
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()